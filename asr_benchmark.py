@@ -0,0 +1,179 @@
+"""Compare recognizer engines on recorded WAV fixtures.
+
+Runs every fixture through each engine as ``--streams`` concurrent
+streams and reports an accuracy proxy, latency and throughput:
+
+- WER against ``<fixture>.txt`` when a reference transcript exists,
+  otherwise word disagreement with the first engine's output.
+- End of utterance -> final result latency, measured when audio is fed at
+  ``--speed`` times real time (with ``--speed 0`` audio is fed as fast as
+  possible and only throughput is meaningful).
+- Throughput: seconds of audio recognized per wall-clock second.
+
+    python asr_benchmark.py --vosk-model vosk-model-small-en-us --hf-model models/wav2vec2-base-960h fixtures/*.wav
+
+A tiny, randomly initialized CTC model lets the transformers path run
+without a download (its transcripts are noise, its timings are real):
+
+    python asr_benchmark.py --make-tiny-model models/tiny-ctc
+    python asr_benchmark.py --hf-model models/tiny-ctc --streams 8 fixtures/*.wav
+"""
+import os
+import json
+import time
+import argparse
+import threading
+
+from benchmark import SAMPLE_RATE, BLOCKSIZE, TRAILING_SILENCE, load_fixture, percentiles, format_ms
+from recognizers import create_engine
+
+def make_tiny_model(path, seed=0):
+    """Save a tiny random wav2vec2 CTC model with a character vocabulary to ``path``"""
+    import torch
+    from transformers import (Wav2Vec2Config, Wav2Vec2CTCTokenizer, Wav2Vec2FeatureExtractor, Wav2Vec2ForCTC,
+                              Wav2Vec2Processor)
+    os.makedirs(path, exist_ok=True)
+    vocab = {"<pad>": 0, "<s>": 1, "</s>": 2, "<unk>": 3, "|": 4, "'": 5}
+    vocab.update({chr(c): len(vocab) for c in range(ord("a"), ord("z") + 1)})
+    vocab_path = os.path.join(path, "vocab.json")
+    with open(vocab_path, "w", encoding="utf-8") as fh:
+        json.dump(vocab, fh)
+
+    tokenizer = Wav2Vec2CTCTokenizer(vocab_path, unk_token="<unk>", pad_token="<pad>", word_delimiter_token="|")
+    feature_extractor = Wav2Vec2FeatureExtractor(feature_size=1, sampling_rate=SAMPLE_RATE, padding_value=0.0,
+                                                 do_normalize=True, return_attention_mask=True)
+    config = Wav2Vec2Config(vocab_size=len(vocab), hidden_size=64, num_hidden_layers=2, num_attention_heads=2,
+                            intermediate_size=128, conv_dim=(32,) * 7, feat_extract_norm="layer",
+                            num_conv_pos_embeddings=16, num_conv_pos_embedding_groups=4, pad_token_id=0)
+    torch.manual_seed(seed)
+    Wav2Vec2ForCTC(config).save_pretrained(path)
+    Wav2Vec2Processor(feature_extractor=feature_extractor, tokenizer=tokenizer).save_pretrained(path)
+    print(f"Saved tiny CTC model to {path}")
+
+def word_errors(reference, hypothesis):
+    """Word-level edit distance"""
+    ref, hyp = reference.split(), hypothesis.split()
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        previous, row[0] = row[0], i
+        for j, h in enumerate(hyp, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (r != h))
+    return row[-1]
+
+def load_reference(path):
+    text_path = os.path.splitext(path)[0] + ".txt"
+    if not os.path.exists(text_path):
+        return None
+    with open(text_path, "r", encoding="utf-8") as fh:
+        return " ".join(fh.read().lower().split())
+
+def run_stream(engine, pcm, speed, out):
+    """Feed one fixture to a new stream; records finals with their latency"""
+    rec = engine.create_stream(SAMPLE_RATE)
+    block_bytes = BLOCKSIZE * 2
+    block_seconds = BLOCKSIZE / float(SAMPLE_RATE)
+    started = time.perf_counter()
+
+    def record(raw):
+        res = json.loads(raw)
+        words = res.get("result") or []
+        end = words[-1]["end"] if words else res.get("end")
+        if not res.get("text") and end is None:
+            return
+        latency = None
+        if speed and end is not None:
+            latency = time.perf_counter() - (started + end / speed)
+        out.append((res.get("text", ""), latency))
+
+    for i, offset in enumerate(range(0, len(pcm), block_bytes)):
+        if speed:
+            delay = started + (i + 1) * block_seconds / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if rec.AcceptWaveform(pcm[offset:offset + block_bytes]):
+            record(rec.Result())
+    for raw in rec.flush() if hasattr(rec, "flush") else [rec.FinalResult()]:
+        record(raw)
+
+def run_engine(engine, fixtures, streams=1, speed=0.0):
+    """Run ``streams`` concurrent copies of every fixture through the engine"""
+    silence = b"\0" * int(TRAILING_SILENCE * SAMPLE_RATE) * 2
+    outputs = {}
+    threads = []
+    started = time.perf_counter()
+    for path, pcm in fixtures.items():
+        for n in range(streams):
+            out = outputs.setdefault((path, n), [])
+            thread = threading.Thread(target=run_stream, args=(engine, pcm + silence, speed, out), daemon=True)
+            thread.start()
+            threads.append(thread)
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    audio = sum(len(pcm) / 2.0 / SAMPLE_RATE for pcm in fixtures.values()) * streams
+    return {
+        "texts": {path: " ".join(text for text, _ in outputs[(path, 0)] if text) for path in fixtures},
+        "latencies": [latency for out in outputs.values() for _, latency in out if latency is not None],
+        "audio_seconds": audio,
+        "wall_seconds": wall,
+        "throughput": audio / wall if wall else 0.0,
+        "stats": engine.get_stats(),
+    }
+
+def report(results, fixtures):
+    """Print accuracy proxy, latency percentiles and throughput per engine"""
+    references = {path: load_reference(path) for path in fixtures}
+    baseline = next(iter(results.values()))["texts"]
+    print(f"\n{'engine':<14}{'WER':>7}{'lat p50':>9}{'lat p90':>9}{'lat p99':>9}{'audio s/s':>11}{'batches':>9}")
+    for name, r in results.items():
+        errors = words = 0
+        for path, text in r["texts"].items():
+            reference = references[path] if references[path] is not None else baseline[path]
+            errors += word_errors(reference, text)
+            words += len(reference.split())
+        p = percentiles(r["latencies"])
+        stats = r["stats"]
+        batches = f"{stats['batches']}/{stats['avg_batch']:.1f}" if "batches" in stats else "-"
+        wer = f"{errors / words:.1%}" if words else "n/a"
+        print(f"{name:<14}{wer:>7}{format_ms(p[50]):>9}{format_ms(p[90]):>9}{format_ms(p[99]):>9}"
+              f"{r['throughput']:>11.1f}{batches:>9}")
+    if not all(references.values()):
+        print(f"(WER of fixtures without a .txt reference is measured against {next(iter(results))})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare recognizer engines on WAV fixtures")
+    parser.add_argument("fixtures", nargs="*", help="Mono 16-bit 16 kHz WAV files (optional <name>.txt references)")
+    parser.add_argument("--vosk-model", default=None, help="Vosk model folder")
+    parser.add_argument("--hf-model", default=None, help="Local transformers speech-to-text model folder")
+    parser.add_argument("--streams", type=int, default=4, help="Concurrent streams per fixture")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="Feed audio at this multiple of real time (0 = as fast as possible)")
+    parser.add_argument("--batch-size", type=int, default=8, help="Utterances per forward pass (transformers)")
+    parser.add_argument("--threads", type=int, default=None, help="Torch threads (default: physical cores)")
+    parser.add_argument("--make-tiny-model", default=None, metavar="DIR", help="Save a tiny random CTC model and exit")
+    args = parser.parse_args()
+
+    if args.make_tiny_model:
+        make_tiny_model(args.make_tiny_model)
+        raise SystemExit(0)
+    if not args.fixtures or not (args.vosk_model or args.hf_model):
+        parser.error("give fixtures and at least one of --vosk-model/--hf-model")
+
+    fixtures = {path: load_fixture(path) for path in args.fixtures}
+    engines = {}
+    if args.vosk_model:
+        engines["vosk"] = lambda: create_engine("vosk", model_path=args.vosk_model)
+    if args.hf_model:
+        engines["transformers"] = lambda: create_engine("transformers", model_path=args.hf_model,
+                                                        batch_size=args.batch_size, threads=args.threads)
+
+    results = {}
+    for name, make in engines.items():
+        engine = make()
+        print(f"Running {name} with {args.streams} streams per fixture...")
+        try:
+            results[name] = run_engine(engine, fixtures, streams=args.streams, speed=args.speed)
+        finally:
+            engine.close()
+    report(results, fixtures)
@@ -1,18 +1,143 @@
-import pygame
+import io
+import wave
+import numpy as np
 import sounddevice as sd
 from pygame import mixer
 import threading
 import time
 import queue
+from collections import deque
+from metrics import metrics
+
+GAP_THRESHOLD = 0.005  # seconds of silence between clips counted as an audible gap
+CATCH_UP_TEMPO = 1.15  # playback speed while catching up with the live speaker
+
+def wall_time(perf_time):
+    """Convert a perf_counter timestamp to wall-clock time (for traces)"""
+    return time.time() + (perf_time - time.perf_counter())
+
+def pcm_to_wav(pcm, sample_rate, channels=1, sample_width=2):
+    """Wrap raw PCM samples in a WAV header (in memory)"""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sample_width)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm)
+    return buf.getvalue()
+
+def speed_up(samples, tempo, sample_rate, frame_ms=30, search_ms=8):
+    """Shorten int16 audio (frames x channels) by ``tempo`` without changing its pitch.
+
+    Waveform-similarity overlap-add: Hann-windowed frames are taken every
+    ``frame/2 * tempo`` input samples and laid down every ``frame/2``
+    output samples, each shifted by up to ``search_ms`` to line up with
+    the waveform of the frame before it so voices do not warble.
+    """
+    frame = max(2, int(sample_rate * frame_ms / 1000))
+    hop_out = frame // 2
+    hop_in = int(round(hop_out * tempo))
+    search = int(sample_rate * search_ms / 1000)
+    x = samples.astype(np.float32)
+    n_frames = (len(x) - frame - search) // hop_in
+    if tempo <= 1.0 or n_frames < 2:
+        return samples
+
+    window = np.hanning(frame).astype(np.float32)[:, None]
+    out = np.zeros((n_frames * hop_out + frame, x.shape[1]), dtype=np.float32)
+    norm = np.zeros((len(out), 1), dtype=np.float32)
+    mono = x.sum(axis=1)
+    best = 0
+    for k in range(n_frames):
+        if k:
+            # Where the previous frame would naturally have continued
+            reference = mono[best + hop_out:best + hop_out + frame]
+            lo = max(0, k * hop_in - search)
+            hi = min(len(x) - frame, k * hop_in + search)
+            best = lo + int(np.argmax(np.correlate(mono[lo:hi + frame], reference, mode="valid")))
+        start = k * hop_out
+        out[start:start + frame] += x[best:best + frame] * window
+        norm[start:start + frame] += window
+    out /= np.maximum(norm, 1e-3)
+    return np.clip(out, -32768, 32767).astype(np.int16)
+
+class AudioClip:
+    """An in-memory clip: encoded audio bytes (mp3, wav, ...) or raw PCM.
+
+    For ``fmt='pcm'`` the data is interleaved signed 16-bit samples and
+    ``sample_rate``/``channels`` describe its layout. ``decoded`` may hold
+    a mixer.Sound decoded ahead of time, which the player uses as is.
+    """
+
+    def __init__(self, data, fmt="mp3", sample_rate=None, channels=1, label=None):
+        if fmt == "pcm" and not sample_rate:
+            raise ValueError("PCM clips need a sample rate")
+        self.data = bytes(data) if isinstance(data, (bytearray, memoryview)) else data
+        self.fmt = fmt
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.label = label or f"<in-memory {fmt}>"
+        self.decoded = None
+
+    def open(self):
+        """Return a file-like object pygame can decode"""
+        if self.fmt == "pcm":
+            return io.BytesIO(pcm_to_wav(self.data, self.sample_rate, self.channels))
+        return io.BytesIO(self.data)
+
+    def namehint(self):
+        """Format hint for pygame's decoder"""
+        return "wav" if self.fmt == "pcm" else self.fmt
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return f"AudioClip({self.label!r}, {self.fmt}, {len(self.data)} bytes)"
 
 class AudioPlayer:
-    def __init__(self):
-        pygame.init()
-        mixer.init()
+    def __init__(self, device_id=None, max_lag=None, preempt=True, catch_up_threshold=None,
+                 catch_up_tempo=CATCH_UP_TEMPO):
+        # Only the mixer is needed; pygame.init() would also bring up display, joystick, etc.
+        if device_id is None or not self.set_output_device(device_id):
+            mixer.init()
+        self.configure_lag(max_lag, preempt, catch_up_threshold, catch_up_tempo)
         self.play_queue = queue.Queue()
         self.current_file = None
         self.playing_thread = None
         self.running = False
+        self.stop_event = threading.Event()
+        self.channel = None
+        self.schedule = deque()  # (expected end time, label, trace) of sounds handed to the mixer
+        self.handling = False    # the worker holds a clip that is not scheduled yet
+        self.last_end = None
+        self.gaps = deque(maxlen=1000)
+        self.lags = deque(maxlen=1000)
+        self.stats_lock = threading.Lock()
+
+        # Statistics
+        self.dropped_stale = 0
+        self.preempted = 0
+        self.caught_up = 0
+        self.catch_up_saved = 0.0
+
+    def configure_lag(self, max_lag=None, preempt=True, catch_up_threshold=None, catch_up_tempo=CATCH_UP_TEMPO):
+        """Bound how far playback may fall behind the live speaker.
+
+        A clip's lag is the time from when its speech was captured (or, for
+        clips without a trace, when it was queued) to when it starts playing.
+        With ``max_lag`` (seconds) a clip that is already older than that
+        when its turn comes is dropped, unless an earlier clip of the same
+        utterance is playing (its remaining chunks are not cut off). If a fresh clip would still start
+        too late because earlier speech is playing, ``preempt`` cuts that
+        speech off (never the clip's own utterance). While the projected lag
+        is above ``catch_up_threshold``, clips play ``catch_up_tempo`` times
+        faster (same pitch) until playback has caught up.
+        """
+        self.max_lag = max_lag
+        self.preempt = preempt
+        self.catch_up_threshold = catch_up_threshold
+        self.catch_up_tempo = catch_up_tempo
 
     def list_audio_devices(self):
         """List all available audio output devices"""
@@ -43,47 +168,205 @@ class AudioPlayer:
                 raise ValueError("Selected device does not support audio output")
             
             # Configure pygame mixer for the selected device
-            mixer.quit()
+            if mixer.get_init():
+                mixer.quit()
             mixer.init(devicename=device_info['name'])
+            self.channel = None
             return True
         except Exception as e:
             print(f"Error setting output device: {e}")
             return False
 
-    def queue_audio(self, audio_file):
-        """Add an audio file to the playback queue"""
-        self.play_queue.put(audio_file)
+    def queue_audio(self, audio, fmt="mp3", trace=None, sample_rate=None, channels=1):
+        """Add audio to the playback queue.
+
+        ``audio`` may be a file path, an AudioClip, or encoded audio as
+        bytes/BytesIO (``fmt`` names its format). Raw PCM (``fmt='pcm'``,
+        signed 16-bit) needs its ``sample_rate`` and ``channels``. In-memory
+        audio is played without touching the filesystem. ``trace`` (a
+        metrics.Trace) gets the enqueue and playback timestamps of the clip.
+        """
+        if isinstance(audio, io.BytesIO):
+            audio = AudioClip(audio.getvalue(), fmt=fmt, sample_rate=sample_rate, channels=channels)
+        elif isinstance(audio, (bytes, bytearray, memoryview)):
+            audio = AudioClip(audio, fmt=fmt, sample_rate=sample_rate, channels=channels)
+        if trace:
+            trace.mark("enqueued", overwrite=False)
+        self.play_queue.put((audio, time.perf_counter(), trace))
+
+    def _decode(self, audio):
+        """Decode a queued path or AudioClip into a mixer.Sound"""
+        if isinstance(audio, AudioClip):
+            if audio.decoded is not None:
+                return audio.decoded
+            return mixer.Sound(file=audio.open())
+        return mixer.Sound(file=audio)
+
+    def _get_channel(self):
+        """Return the mixer channel reserved for speech playback"""
+        if self.channel is None:
+            mixer.set_reserved(1)
+            self.channel = mixer.Channel(0)
+        return self.channel
+
+    def _wait_for_slot(self, channel):
+        """Block until the channel can take another queued sound.
+
+        A channel plays one sound and holds at most one more. The end time of
+        every scheduled sound is known, so instead of polling the mixer we
+        sleep until the current sound is due to finish. The stop event wakes
+        the wait immediately on shutdown.
+        """
+        while self.running:
+            now = time.perf_counter()
+            self._retire_finished(now)
+
+            if channel.get_queue() is None:
+                return
+            if self.schedule:
+                timeout = self.schedule[0][0] - now
+            else:
+                # Mixer clock drifted past our estimate; the hand-over is imminent
+                timeout = 0.005
+            self.stop_event.wait(timeout)
+
+    def _retire_finished(self, now):
+        """Drop sounds that have finished playing from the schedule"""
+        while self.schedule and self.schedule[0][0] <= now:
+            end, label, trace = self.schedule.popleft()
+            if trace:
+                trace.clip_played(wall_time(end))
+        self.current_file = self.schedule[0][1] if self.schedule else None
+
+    def _record_gap(self, gap):
+        """Track silence between clips that were already waiting to play"""
+        with self.stats_lock:
+            self.gaps.append(gap)
+        if gap > GAP_THRESHOLD:
+            metrics.incr("playback_gaps")
+            metrics.incr("playback_gap_seconds", gap)
+
+    def _origin(self, queued_at, trace):
+        """perf_counter time the clip's speech was captured (or it was queued)"""
+        captured = trace.stages.get("audio_captured") if trace else None
+        if captured is None:
+            return queued_at
+        return time.perf_counter() - (time.time() - captured)
+
+    def _drop_stale(self, trace, lag):
+        self.dropped_stale += 1
+        metrics.incr("playback_dropped_stale")
+        print(f"Dropping clip {lag:.1f}s behind the speaker (max lag {self.max_lag:.1f}s)")
+        if trace:
+            trace.mark("dropped")
+            trace.clip_played()
+
+    def _preempt(self, channel, trace):
+        """Cut off earlier utterances still playing so a fresh clip starts now"""
+        if not self.schedule or any(entry[2] is trace and trace is not None for entry in self.schedule):
+            return False
+        channel.stop()
+        now = time.perf_counter()
+        while self.schedule:
+            _, label, old_trace = self.schedule.popleft()
+            if old_trace:
+                old_trace.mark("preempted")
+                old_trace.clip_played(wall_time(now))
+        self.last_end = None
+        self.preempted += 1
+        metrics.incr("playback_preempted")
+        return True
+
+    def _catch_up(self, sound):
+        """Return a faster copy of a decoded sound"""
+        from pygame import sndarray
+        freq, _, _ = mixer.get_init()
+        samples = sndarray.array(sound)
+        shape = samples.shape
+        faster = speed_up(samples.reshape(len(samples), -1), self.catch_up_tempo, freq)
+        if len(faster) == len(samples):
+            return sound
+        self.caught_up += 1
+        self.catch_up_saved += (len(samples) - len(faster)) / float(freq)
+        metrics.incr("playback_catch_up_clips")
+        return sndarray.make_sound(np.ascontiguousarray(faster.reshape((len(faster),) + shape[1:])))
 
     def play_worker(self):
-        """Background worker to handle audio playback"""
+        """Background worker to handle gapless audio playback"""
         while self.running:
             try:
-                # Get the next audio file from the queue
-                audio_file = self.play_queue.get(timeout=1)
-                self.current_file = audio_file
-
-                # Play the audio file
-                mixer.music.load(audio_file)
-                mixer.music.play()
-                
-                # Wait for the audio to finish
-                while mixer.music.get_busy():
-                    time.sleep(0.1)
-                    if not self.running:
-                        break
-
-                self.current_file = None
-                
+                # Get the next clip from the queue
+                item = self.play_queue.get(timeout=1)
+                if item is None:
+                    break
+                self.handling = True  # taken off the queue, not yet scheduled
+                audio, queued_at, trace = item
+                label = audio.label if isinstance(audio, AudioClip) else audio
+
+                # How late would this clip start behind the live speaker?
+                now = time.perf_counter()
+                self._retire_finished(now)
+                origin = self._origin(queued_at, trace)
+                # Never cut the tail off the utterance that is already playing
+                playing_own = trace is not None and any(entry[2] is trace for entry in self.schedule)
+                if self.max_lag is not None and now - origin > self.max_lag and not playing_own:
+                    self._drop_stale(trace, now - origin)
+                    continue
+                channel = self._get_channel()
+                backlog = max(0.0, self.schedule[-1][0] - now) if self.schedule else 0.0
+                if self.max_lag is not None and self.preempt and now + backlog - origin > self.max_lag:
+                    self._preempt(channel, trace)
+                    backlog = max(0.0, self.schedule[-1][0] - now) if self.schedule else 0.0
+
+                # Decode now, while the previous clip is still playing
+                sound = self._decode(audio)
+                if self.catch_up_threshold is not None and now + backlog - origin > self.catch_up_threshold:
+                    sound = self._catch_up(sound)
+                self._wait_for_slot(channel)
+                if not self.running:
+                    break
+
+                now = time.perf_counter()
+                previous_end = self.schedule[-1][0] if self.schedule else None
+                if channel.get_busy():
+                    # Hand the sound to the mixer so it starts on the very next sample
+                    channel.queue(sound)
+                    start = max(previous_end or now, now)
+                    self._record_gap(0.0)
+                else:
+                    channel.play(sound)
+                    start = now
+                    if self.last_end is not None and queued_at < self.last_end:
+                        # Clip was waiting but the channel ran dry before we got to it
+                        self._record_gap(now - self.last_end)
+
+                end = start + sound.get_length()
+                lag = start - origin
+                with self.stats_lock:
+                    self.lags.append(lag)
+                metrics.set_gauge("playback_lag_seconds", lag)
+                if trace:
+                    trace.mark("playback_start", wall_time(start), overwrite=False)
+                self.schedule.append((end, label, trace))
+                self.last_end = end
+                if len(self.schedule) == 1:
+                    self.current_file = label
+
             except queue.Empty:
+                # Nothing queued; keep the current-file bookkeeping fresh
+                self._retire_finished(time.perf_counter())
                 continue
             except Exception as e:
                 print(f"Error playing audio: {e}")
-                time.sleep(1)
+                self.stop_event.wait(1)
+            finally:
+                self.handling = False
 
     def start_playback_thread(self):
         """Start the background playback thread"""
         if self.playing_thread is None:
             self.running = True
+            self.stop_event.clear()
             self.playing_thread = threading.Thread(target=self.play_worker, daemon=True)
             self.playing_thread.start()
 
@@ -91,10 +374,12 @@ class AudioPlayer:
         """Stop the background playback thread"""
         print("Stopping audio playback...")
         self.running = False
+        self.stop_event.set()
+        self.play_queue.put(None)  # Wake the worker if it is waiting for a clip
         if self.playing_thread:
-            if mixer.music.get_busy():
+            if self.channel is not None and self.channel.get_busy():
                 print("Stopping current playback...")
-                mixer.music.stop()
+                self.channel.stop()
             try:
                 print("Waiting for playback thread to finish...")
                 self.playing_thread.join(timeout=2)  # Wait up to 2 seconds
@@ -103,9 +388,57 @@ class AudioPlayer:
             except Exception as e:
                 print(f"Error stopping playback thread: {e}")
             self.playing_thread = None
+        self.channel = None
         mixer.quit()  # Ensure pygame mixer is properly shut down
+
+        stats = self.get_gap_stats()
+        if stats["count"]:
+            print(f"Playback gaps: avg {stats['avg'] * 1000:.1f} ms, max {stats['max'] * 1000:.1f} ms "
+                  f"over {stats['count']} back-to-back clips")
+        stats = self.get_lag_stats()
+        if stats["count"]:
+            print(f"Playback lag: avg {stats['avg']:.2f}s, max {stats['max']:.2f}s over {stats['count']} clips; "
+                  f"{stats['dropped_stale']} stale clips dropped, {stats['preempted']} preemptions, "
+                  f"{stats['caught_up']} clips sped up ({stats['catch_up_saved']:.1f}s saved)")
         print("Audio playback stopped")
 
+    def get_gap_stats(self):
+        """Return silence between back-to-back clips (seconds)"""
+        with self.stats_lock:
+            gaps = list(self.gaps)
+        return {
+            "count": len(gaps),
+            "avg": sum(gaps) / len(gaps) if gaps else 0.0,
+            "max": max(gaps) if gaps else 0.0,
+        }
+
+    def get_lag_stats(self):
+        """Return lag behind the speaker at playback start (seconds) and drop counters"""
+        with self.stats_lock:
+            lags = list(self.lags)
+        return {
+            "count": len(lags),
+            "avg": sum(lags) / len(lags) if lags else 0.0,
+            "max": max(lags) if lags else 0.0,
+            "dropped_stale": self.dropped_stale,
+            "preempted": self.preempted,
+            "caught_up": self.caught_up,
+            "catch_up_saved": self.catch_up_saved,
+        }
+
+    def is_busy(self):
+        """True while clips are queued or still playing.
+
+        Judged by the last scheduled end time rather than the schedule's
+        length, since finished sounds are only pruned when the worker wakes.
+        """
+        if self.handling or not self.play_queue.empty():
+            return True
+        try:
+            return self.schedule[-1][0] > time.perf_counter()
+        except IndexError:
+            return False
+
     def get_current_file(self):
-        """Get the currently playing audio file"""
+        """Get the currently playing audio file (or label of an in-memory clip)"""
         return self.current_file
\ No newline at end of file
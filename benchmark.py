@@ -0,0 +1,312 @@
+"""End-to-end latency benchmark driven by recorded WAV fixtures.
+
+Feeds fixtures through the real ``transcription.main`` loop using a fake
+``sounddevice`` module, sends final results through
+``main.process_transcription`` -> ``text_to_speech`` with the stub TTS
+backend, and plays clips into a null audio sink. No sound card, display
+or network is needed, so it runs on a headless Linux box:
+
+    python benchmark.py --model vosk-model-small-en-us fixtures/*.wav
+"""
+import os
+import sys
+import io
+import json
+import time
+import wave
+import types
+import queue
+import argparse
+import threading
+import _thread
+
+# Must be set before pygame is imported anywhere
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+SAMPLE_RATE = 16000
+BLOCKSIZE = 4000
+TRAILING_SILENCE = 1.5  # seconds fed after each fixture so the recognizer finalizes
+
+def load_fixture(path, samplerate=SAMPLE_RATE):
+    """Read a mono 16-bit WAV fixture and return its PCM bytes"""
+    with wave.open(path, "rb") as wf:
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != samplerate:
+            raise ValueError(f"{path}: fixtures must be mono 16-bit PCM at {samplerate} Hz")
+        return wf.readframes(wf.getnframes())
+
+class FakeInputStream:
+    """Stand-in for sounddevice.RawInputStream that plays PCM into the callback.
+
+    Blocks are delivered at ``speed`` times real time from a background
+    thread. When the audio runs out the main thread is interrupted, which
+    ends ``transcription.main`` the same way Ctrl+C does.
+    """
+
+    def __init__(self, fake_sd, samplerate=SAMPLE_RATE, blocksize=BLOCKSIZE, dtype='int16',
+                 channels=1, callback=None, device=None, **kwargs):
+        self.fake_sd = fake_sd
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.channels = channels
+        self.callback = callback
+        self.active = False
+        self.thread = None
+
+    def __enter__(self):
+        self.active = True
+        self.thread = threading.Thread(target=self._feed, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.active = False
+        return False
+
+    def _feed(self):
+        pcm = self.fake_sd.pcm
+        block_bytes = self.blocksize * 2 * self.channels
+        block_duration = self.blocksize / float(self.samplerate)
+        self.fake_sd.stream_start = start = time.perf_counter()
+        for i, offset in enumerate(range(0, len(pcm), block_bytes)):
+            if not self.active:
+                return
+            # Pace delivery like a real device: block i is ready at its end time
+            due = start + (i + 1) * block_duration / self.fake_sd.speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            block = pcm[offset:offset + block_bytes]
+            if len(block) < block_bytes:
+                block += b"\0" * (block_bytes - len(block))
+            self.callback(block, self.blocksize, None, None)
+        self.fake_sd.finished.set()
+        _thread.interrupt_main()
+
+def make_fake_sounddevice(pcm, speed=1.0):
+    """Build a module object that mimics the parts of sounddevice we use"""
+    fake_sd = types.ModuleType("sounddevice")
+    fake_sd.pcm = pcm
+    fake_sd.speed = speed
+    fake_sd.stream_start = None
+    fake_sd.finished = threading.Event()
+    fake_sd.PortAudioError = type("PortAudioError", (Exception,), {})
+    fake_sd.default = types.SimpleNamespace(device=(0, 0))
+    device = {"name": "benchmark fixture", "max_input_channels": 1, "max_output_channels": 2,
+              "default_samplerate": float(SAMPLE_RATE), "default_samplerates": [SAMPLE_RATE]}
+    fake_sd.query_devices = lambda device_id=None, kind=None: device if device_id is not None else [device]
+    fake_sd.RawInputStream = lambda **kwargs: FakeInputStream(fake_sd, **kwargs)
+    return fake_sd
+
+class NullAudioSink:
+    """Audio player replacement that 'plays' clips by waiting out their duration"""
+
+    def __init__(self):
+        self.play_queue = queue.Queue()
+        self.thread = None
+        self.running = False
+
+    def queue_audio(self, audio, fmt="mp3", trace=None):
+        if trace:
+            trace.mark("enqueued", overwrite=False)
+        self.play_queue.put((audio, trace))
+
+    def _duration(self, audio):
+        data = getattr(audio, "data", None)
+        try:
+            source = io.BytesIO(data) if data is not None else audio
+            with wave.open(source, "rb") as wf:
+                return wf.getnframes() / float(wf.getframerate())
+        except Exception:
+            return 0.0
+
+    def _play(self):
+        while self.running:
+            try:
+                audio, trace = self.play_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if trace:
+                trace.mark("playback_start", overwrite=False)
+            time.sleep(self._duration(audio))
+            if trace:
+                trace.clip_played()
+
+    def start_playback_thread(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._play, daemon=True)
+        self.thread.start()
+
+    def stop_playback_thread(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+
+    def wait_idle(self, traces, timeout=30):
+        """Wait until every trace has started playing (or finished without a clip)"""
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if all(trace.finished or "playback_start" in trace.stages for trace in traces):
+                return
+            time.sleep(0.05)
+
+class TimedRecognizer:
+    """Wraps a KaldiRecognizer to time AcceptWaveform and record final results"""
+
+    def __init__(self, recognizer_cls, model, samplerate):
+        self.rec = recognizer_cls(model, samplerate)
+        self.samplerate = samplerate
+        self.busy_time = 0.0
+        self.audio_seconds = 0.0
+        self.finals = []  # (perf_counter time, parsed result)
+
+    def __getattr__(self, name):
+        return getattr(self.rec, name)
+
+    def AcceptWaveform(self, data):
+        started = time.perf_counter()
+        try:
+            return self.rec.AcceptWaveform(data)
+        finally:
+            self.busy_time += time.perf_counter() - started
+            self.audio_seconds += len(data) / 2.0 / self.samplerate
+
+    def _record(self, raw):
+        res = json.loads(raw)
+        if res.get("text"):
+            self.finals.append((time.perf_counter(), res))
+        return raw
+
+    def Result(self):
+        return self._record(self.rec.Result())
+
+    def FinalResult(self):
+        return self._record(self.rec.FinalResult())
+
+def percentiles(samples, points=(50, 90, 99)):
+    """Nearest-rank percentiles of a list of samples"""
+    if not samples:
+        return {p: None for p in points}
+    ordered = sorted(samples)
+    return {p: ordered[min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered))) - 1))] for p in points}
+
+def format_ms(value):
+    return "    n/a" if value is None else f"{value * 1000:7.1f}"
+
+def run_benchmark(fixtures, model_path, speed=1.0, tts_latency=0.05, tts_workers=2, vad=None,
+                  blocksize=BLOCKSIZE, speculative=False):
+    """Run the pipeline over the fixtures and return the collected latencies"""
+    silence = b"\0" * int(TRAILING_SILENCE * SAMPLE_RATE) * 2
+    pcm = b"".join(load_fixture(path) + silence for path in fixtures)
+
+    # Swap in the fake device before the pipeline modules import sounddevice
+    fake_sd = make_fake_sounddevice(pcm, speed=speed)
+    sys.modules["sounddevice"] = fake_sd
+
+    import transcription
+    import transcript_to_tts
+    import main as pipeline
+    from tts_engines import StubEngine
+
+    recognizers = []
+    real_recognizer = transcription.KaldiRecognizer
+
+    def make_recognizer(model, samplerate):
+        rec = TimedRecognizer(real_recognizer, model, samplerate)
+        recognizers.append(rec)
+        return rec
+
+    transcription.KaldiRecognizer = make_recognizer
+
+    gates = []
+    real_gate = transcription.VoiceActivityGate
+
+    def make_gate(**kwargs):
+        gate = real_gate(**kwargs)
+        gates.append(gate)
+        return gate
+
+    transcription.VoiceActivityGate = make_gate
+
+    # trace_id -> (perf_counter time of the final, parsed result, seconds skipped by the VAD so far, trace)
+    finals = {}
+
+    def on_final(text, trace=None):
+        # The recognizer just returned this final on the same thread, so it is the latest one
+        final_at, res = recognizers[-1].finals[-1]
+        # Word times only count audio fed to the recognizer; silence skipped before it is missing
+        skipped = gates[-1].skipped_seconds if gates else 0.0
+        finals[trace.trace_id] = (final_at, res, skipped, trace)
+        pipeline.process_transcription(text, trace=trace)
+
+    sink = NullAudioSink()
+    transcript_to_tts.initialize(engine=StubEngine(latency=tts_latency), use_cache=False,
+                                 tts_workers=tts_workers, player=sink, speculative=speculative)
+    try:
+        try:
+            transcription.main(model_path=model_path, device=0, callback_fn=on_final,
+                               vad=vad, blocksize=blocksize,
+                               partial_fn=transcript_to_tts.on_partial if speculative else None)
+        except KeyboardInterrupt:
+            pass
+        rec = recognizers[-1]
+        sink.wait_idle([trace for _, _, _, trace in finals.values()])
+    finally:
+        transcription.KaldiRecognizer = real_recognizer
+        transcription.VoiceActivityGate = real_gate
+        transcript_to_tts.cleanup()
+
+    # Match each final to its first clip and playback start by trace ID
+    eos_to_final, final_to_clip, clip_to_play = [], [], []
+    for final_at, res, skipped, trace in finals.values():
+        words = res.get("result") or []
+        if words:
+            speech_end = fake_sd.stream_start + (words[-1]["end"] + skipped) / speed
+            eos_to_final.append(final_at - speech_end)
+        stages = dict(trace.stages)
+        if "enqueued" in stages:
+            final_to_clip.append(stages["enqueued"] - stages["final_result"])
+            if "playback_start" in stages:
+                clip_to_play.append(stages["playback_start"] - stages["enqueued"])
+
+    return {
+        "utterances": len(rec.finals),
+        "audio_seconds": rec.audio_seconds,
+        "recognizer_rtf": rec.busy_time / rec.audio_seconds if rec.audio_seconds else 0.0,
+        "eos_to_final": eos_to_final,
+        "final_to_clip": final_to_clip,
+        "clip_to_play": clip_to_play,
+    }
+
+def report(results):
+    """Print latency percentiles and recognizer real-time factor"""
+    print(f"\nUtterances: {results['utterances']}, audio: {results['audio_seconds']:.1f}s, "
+          f"recognizer RTF: {results['recognizer_rtf']:.3f}")
+    print(f"{'stage (ms)':<26}{'p50':>8}{'p90':>8}{'p99':>8}")
+    for label, key in (("end of speech -> final", "eos_to_final"),
+                       ("final -> clip ready", "final_to_clip"),
+                       ("clip ready -> playback", "clip_to_play")):
+        p = percentiles(results[key])
+        print(f"{label:<26}{format_ms(p[50]):>8}{format_ms(p[90]):>8}{format_ms(p[99]):>8}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end latency benchmark over recorded WAV fixtures")
+    parser.add_argument("fixtures", nargs="+", help="Mono 16-bit 16 kHz WAV files")
+    parser.add_argument("--model", default="vosk-model-small-en-us", help="Path to Vosk model folder")
+    parser.add_argument("--speed", type=float, default=1.0, help="Feed audio at this multiple of real time")
+    parser.add_argument("--tts-latency", type=float, default=0.05, help="Simulated TTS service latency (s)")
+    parser.add_argument("--tts-workers", type=int, default=2, help="TTS worker threads")
+    parser.add_argument("--vad", action="store_true", help="Enable the voice activity gate")
+    parser.add_argument("--blocksize", type=int, default=BLOCKSIZE, help="Frames per capture block")
+    parser.add_argument("--speculative", action="store_true", help="Start TTS on stable partial results")
+    parser.add_argument("--json", help="Also write raw results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.fixtures, args.model, speed=args.speed,
+                            tts_latency=args.tts_latency, tts_workers=args.tts_workers,
+                            vad={} if args.vad else None, blocksize=args.blocksize,
+                            speculative=args.speculative)
+    report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
@@ -0,0 +1,160 @@
+import time
+import threading
+
+class UtteranceCoalescer:
+    """Merges short final results that arrive close together into one TTS request.
+
+    Vosk often emits several short finals in quick succession ("okay",
+    "so", "let's go"); synthesizing each on its own costs a request, a clip
+    and a gap between tiny clips. ``add`` holds text until no new final has
+    arrived for ``window`` seconds and ``busy_fn()`` reports that the
+    pipeline has nothing left to play, then hands everything held to
+    ``flush_fn(text, **kwargs)`` as one utterance. Text is never held
+    longer than ``max_hold`` seconds after its first final, or past
+    ``max_words`` words.
+
+    The merged request carries the kwargs (output file, trace) of its
+    first final, so its trace measures the latency of the oldest text.
+    Traces of the finals merged into it are marked ``coalesced`` and
+    finished right away.
+    """
+
+    def __init__(self, flush_fn, window=0.4, max_hold=1.5, max_words=40, busy_fn=None, poll_interval=0.02):
+        self.flush_fn = flush_fn
+        self.window = window
+        self.max_hold = max_hold
+        self.max_words = max_words
+        self.busy_fn = busy_fn
+        self.poll_interval = poll_interval
+        self.cond = threading.Condition()
+        self.flush_lock = threading.Lock()   # keeps requests in arrival order
+        self.pending = []                    # (text, kwargs) held for the next request
+        self.first_at = None
+        self.last_at = None
+        self.held_busy = False
+        self.thread = None
+        self.running = False
+
+        # Statistics
+        self.finals = 0
+        self.requests = 0
+        self.busy_holds = 0
+        self.capped = 0
+        self.hold_time = 0.0
+        self.max_hold_seen = 0.0
+
+    def start(self):
+        """Start the flush thread"""
+        if self.thread is None:
+            self.running = True
+            self.thread = threading.Thread(target=self.worker, name="coalescer", daemon=True)
+            self.thread.start()
+
+    def add(self, text, **kwargs):
+        """Hold a final result for merging; never blocks on synthesis.
+
+        Without a running flush thread (before ``start`` or after ``close``)
+        the text, and anything still held, is flushed right away instead.
+        """
+        if not text.strip():
+            return
+        with self.cond:
+            now = time.monotonic()
+            if not self.pending:
+                self.first_at = now
+            self.pending.append((text.strip(), kwargs))
+            self.last_at = now
+            self.finals += 1
+            self.cond.notify()
+            held = self.running
+        if not held:
+            self.flush()
+
+    def _pending_words(self):
+        return sum(len(text.split()) for text, _ in self.pending)
+
+    def _next_flush(self, now):
+        """Seconds to wait before the held text may go out, or None to flush now"""
+        held = now - self.first_at
+        if held >= self.max_hold or self._pending_words() >= self.max_words:
+            if held >= self.max_hold:
+                self.capped += 1
+            return None
+        cap = self.max_hold - held
+        quiet = now - self.last_at
+        if quiet < self.window:
+            return min(self.window - quiet, cap)
+        if self.busy_fn and self.busy_fn():
+            if not self.held_busy:
+                self.held_busy = True
+                self.busy_holds += 1
+            return min(self.poll_interval, cap)
+        return None
+
+    def worker(self):
+        """Flush held text once it is quiet and the pipeline is idle, or the cap is hit"""
+        while True:
+            with self.cond:
+                while True:
+                    if not self.pending:
+                        if not self.running:
+                            return
+                        self.cond.wait()
+                        continue
+                    if not self.running:
+                        break
+                    wait = self._next_flush(time.monotonic())
+                    if wait is None:
+                        break
+                    self.cond.wait(wait)
+            self.flush()
+
+    def flush(self):
+        """Send everything held as one request right away"""
+        with self.flush_lock:
+            with self.cond:
+                batch, self.pending = self.pending, []
+                if not batch:
+                    return
+                held = time.monotonic() - self.first_at
+                self.held_busy = False
+                self.requests += 1
+                self.hold_time += held
+                self.max_hold_seen = max(self.max_hold_seen, held)
+
+            text = " ".join(text for text, _ in batch)
+            kwargs = batch[0][1]
+            for _, merged in batch[1:]:
+                trace = merged.get("trace")
+                if trace:
+                    trace.mark("coalesced")
+                    trace.finish()
+            if len(batch) > 1:
+                print(f"Coalesced {len(batch)} finals into one TTS request: {text}")
+            try:
+                self.flush_fn(text, **kwargs)
+            except Exception as e:
+                print(f"Error synthesizing coalesced text '{text}': {e}")
+
+    def get_stats(self):
+        """Return finals received, requests sent and hold times"""
+        with self.cond:
+            return {
+                "finals": self.finals,
+                "requests": self.requests,
+                "saved": self.finals - self.requests - len(self.pending),
+                "busy_holds": self.busy_holds,
+                "capped": self.capped,
+                "avg_hold": self.hold_time / self.requests if self.requests else 0.0,
+                "max_hold": self.max_hold_seen,
+            }
+
+    def close(self, timeout=2):
+        """Flush anything still held and stop the thread"""
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+            self.thread = None
+        self.flush()
@@ -0,0 +1,264 @@
+import io
+import wave
+import time
+import queue
+import threading
+from collections import deque
+
+import numpy as np
+import sounddevice as sd
+
+from audio_player import AudioClip
+from resample import StreamingResampler
+from metrics import metrics
+
+def decode_clip(audio):
+    """Decode a path or AudioClip to (mono float32 samples, sample rate)"""
+    if isinstance(audio, AudioClip) and audio.fmt == "pcm":
+        samples = np.frombuffer(audio.data, dtype=np.int16).reshape(-1, audio.channels)
+        return samples.mean(axis=1, dtype=np.float32), audio.sample_rate
+
+    source = audio.open() if isinstance(audio, AudioClip) else audio
+    fmt = audio.fmt if isinstance(audio, AudioClip) else str(audio).rsplit(".", 1)[-1].lower()
+    if fmt == "wav":
+        with wave.open(source, "rb") as wf:
+            if wf.getsampwidth() != 2:
+                raise ValueError("only 16-bit WAV clips are supported")
+            rate, channels = wf.getframerate(), wf.getnchannels()
+            samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        return samples.reshape(-1, channels).mean(axis=1, dtype=np.float32), rate
+
+    import soundfile  # libsndfile >= 1.1 decodes mp3
+    samples, rate = soundfile.read(source, dtype="int16", always_2d=True)
+    return samples.mean(axis=1, dtype=np.float32), rate
+
+class DeviceOutput:
+    """One output stream fed from its own bounded buffer of PCM chunks.
+
+    The stream callback (on PortAudio's thread for this device) pulls
+    frames and plays silence when the buffer is empty, so a device that
+    stalls only ever delays itself. If its buffer is full the oldest
+    audio is dropped rather than holding up the other devices.
+    """
+
+    def __init__(self, device, samplerate, gain_db=0.0, delay_ms=0.0, max_buffer_seconds=10.0,
+                 primary=False, blocksize=0):
+        self.device = device
+        self.samplerate = samplerate
+        self.gain = 10 ** (gain_db / 20.0)
+        self.delay_ms = delay_ms
+        self.max_frames = int(max_buffer_seconds * samplerate)
+        self.primary = primary
+        self.chunks = deque()      # [samples, position, trace]
+        self.buffered = 0          # frames waiting in self.chunks
+        self.lock = threading.Lock()
+        info = sd.query_devices(device, 'output')
+        self.name = info['name']
+        self.channels = min(2, max(1, info['max_output_channels']))
+        self.stream = sd.OutputStream(device=device, samplerate=samplerate, channels=self.channels,
+                                      dtype='int16', blocksize=blocksize, callback=self.callback)
+
+        # Statistics
+        self.underruns = 0
+        self.dropped_frames = 0
+
+    @property
+    def latency(self):
+        """Output latency PortAudio reports for this stream (seconds)"""
+        return self.stream.latency
+
+    def enqueue(self, samples, trace=None):
+        """Add mono float32 samples (gain is applied here); never blocks"""
+        chunk = np.clip(samples * self.gain, -32768, 32767).astype(np.int16)
+        with self.lock:
+            self.chunks.append([chunk, 0, trace])
+            self.buffered += len(chunk)
+            while self.buffered > self.max_frames and len(self.chunks) > 1:
+                old, position, old_trace = self.chunks.popleft()
+                self.buffered -= len(old) - position
+                self.dropped_frames += len(old) - position
+                if old_trace and self.primary:
+                    old_trace.clip_played()
+
+    def add_silence(self, seconds):
+        """Queue silence, used to line this device up with slower ones"""
+        if seconds > 0:
+            self.enqueue(np.zeros(int(seconds * self.samplerate), dtype=np.float32))
+
+    def callback(self, outdata, frames, time_info, status):
+        if status.output_underflow:
+            self.underruns += 1
+        filled = 0
+        finished = []
+        with self.lock:
+            while filled < frames and self.chunks:
+                entry = self.chunks[0]
+                chunk, position, trace = entry
+                if position == 0 and trace and self.primary:
+                    trace.mark("playback_start", overwrite=False)
+                take = min(frames - filled, len(chunk) - position)
+                outdata[filled:filled + take] = chunk[position:position + take, None]
+                filled += take
+                entry[1] += take
+                self.buffered -= take
+                if entry[1] == len(chunk):
+                    self.chunks.popleft()
+                    if trace and self.primary:
+                        finished.append(trace)
+        if filled < frames:
+            outdata[filled:] = 0
+        for trace in finished:
+            trace.clip_played()
+
+    def is_idle(self):
+        with self.lock:
+            return not self.chunks
+
+    def buffered_seconds(self):
+        with self.lock:
+            return self.buffered / float(self.samplerate)
+
+    def start(self):
+        self.stream.start()
+
+    def stop(self):
+        try:
+            self.stream.stop()
+            self.stream.close()
+        except sd.PortAudioError as e:
+            print(f"Error closing output device {self.device}: {e}")
+
+class FanoutPlayer:
+    """Plays every clip on several output devices at once, decoding it only once.
+
+    Drop-in replacement for AudioPlayer (pass it to
+    ``transcript_to_tts.initialize(player=...)``). Each clip is decoded
+    and resampled to ``samplerate`` a single time on the playback thread;
+    the samples are then handed to one DeviceOutput per device, each with
+    its own gain. Devices with less output latency get extra leading
+    silence so all of them sound at the same moment, plus any per-device
+    ``delay_ms`` for latency the driver does not report (e.g. a virtual
+    cable feeding another application).
+
+    ``outputs`` is a list of dicts: ``{"device": 5, "gain_db": -6,
+    "delay_ms": 20}``. The first output drives trace timestamps. Clips are
+    handed over once the least-buffered device has under
+    ``lookahead_seconds`` queued; a device that falls further behind drops
+    its oldest audio past ``max_buffer_seconds``.
+    """
+
+    def __init__(self, outputs, samplerate=48000, max_buffer_seconds=10.0, lookahead_seconds=1.0):
+        if not outputs:
+            raise ValueError("FanoutPlayer needs at least one output device")
+        self.samplerate = samplerate
+        self.outputs = [DeviceOutput(o["device"], samplerate, gain_db=o.get("gain_db", 0.0),
+                                     delay_ms=o.get("delay_ms", 0.0), max_buffer_seconds=max_buffer_seconds,
+                                     primary=(i == 0))
+                        for i, o in enumerate(outputs)]
+        self.lookahead = lookahead_seconds
+        self.play_queue = queue.Queue()
+        self.playing_thread = None
+        self.running = False
+        self.stop_event = threading.Event()
+        self.current_file = None
+
+        # Statistics
+        self.clips = 0
+        self.decode_time = 0.0
+
+    def list_audio_devices(self):
+        return [sd.query_devices(o.device) for o in self.outputs]
+
+    def set_output_device(self, device_id):
+        print("FanoutPlayer outputs are fixed at construction; ignoring set_output_device")
+        return False
+
+    def queue_audio(self, audio, fmt="mp3", trace=None, sample_rate=None, channels=1):
+        """Add audio to the playback queue (same arguments as AudioPlayer.queue_audio)"""
+        if isinstance(audio, io.BytesIO):
+            audio = AudioClip(audio.getvalue(), fmt=fmt, sample_rate=sample_rate, channels=channels)
+        elif isinstance(audio, (bytes, bytearray, memoryview)):
+            audio = AudioClip(audio, fmt=fmt, sample_rate=sample_rate, channels=channels)
+        if trace:
+            trace.mark("enqueued", overwrite=False)
+        self.play_queue.put((audio, trace))
+
+    def _align(self):
+        """Pad faster devices so every device plays in sync"""
+        totals = [o.latency + o.delay_ms / 1000.0 for o in self.outputs]
+        slowest = max(totals)
+        for output, total in zip(self.outputs, totals):
+            output.add_silence(slowest - total)
+
+    def play_worker(self):
+        """Decode each clip once and fan it out to all devices"""
+        while self.running:
+            try:
+                item = self.play_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            audio, trace = item
+            try:
+                started = time.perf_counter()
+                samples, rate = decode_clip(audio)
+                if rate != self.samplerate:
+                    samples = StreamingResampler(rate, self.samplerate).process(
+                        np.clip(samples, -32768, 32767).astype(np.int16)).astype(np.float32)
+                self.decode_time += time.perf_counter() - started
+                self.clips += 1
+                self.current_file = audio.label if isinstance(audio, AudioClip) else audio
+                # Pace on the device that is keeping up best, never on a stalled one
+                while self.running and min(o.buffered_seconds() for o in self.outputs) > self.lookahead:
+                    self.stop_event.wait(0.01)
+                if all(o.is_idle() for o in self.outputs):
+                    self._align()
+                for output in self.outputs:
+                    output.enqueue(samples, trace=trace)
+            except Exception as e:
+                print(f"Error playing audio: {e}")
+                metrics.incr("playback_errors")
+                if trace:
+                    trace.clip_played()
+
+    def start_playback_thread(self):
+        """Open the output streams and start the playback thread"""
+        if self.playing_thread is None:
+            for output in self.outputs:
+                output.start()
+                print(f"Playing to device {output.device} ({output.name}), "
+                      f"latency {output.latency * 1000:.0f} ms")
+            self.running = True
+            self.stop_event.clear()
+            self.playing_thread = threading.Thread(target=self.play_worker, daemon=True)
+            self.playing_thread.start()
+
+    def stop_playback_thread(self):
+        """Stop the playback thread and close all output streams"""
+        print("Stopping audio playback...")
+        self.running = False
+        self.stop_event.set()
+        self.play_queue.put(None)
+        if self.playing_thread:
+            self.playing_thread.join(timeout=2)
+            self.playing_thread = None
+        for output in self.outputs:
+            output.stop()
+            stats = []
+            if output.underruns:
+                stats.append(f"{output.underruns} underruns")
+            if output.dropped_frames:
+                stats.append(f"{output.dropped_frames / self.samplerate:.1f}s dropped")
+            print(f"Device {output.device}: {', '.join(stats) or 'no underruns or drops'}")
+        if self.clips:
+            print(f"Decoded {self.clips} clips once for {len(self.outputs)} devices, "
+                  f"avg {self.decode_time / self.clips * 1000:.1f} ms per clip")
+        print("Audio playback stopped")
+
+    def is_busy(self):
+        """True while clips are queued or any device still has audio buffered"""
+        return not self.play_queue.empty() or not all(o.is_idle() for o in self.outputs)
+
+    def get_current_file(self):
+        return self.current_file
@@ -1,74 +1,240 @@
 import os
 import time
+import heapq
 from datetime import datetime, timedelta
 import threading
 
 class FileManager:
-    def __init__(self, retention_minutes=1):
+    """Deletes generated files once their retention period is over.
+
+    Files the application writes are registered through ``mark_file_active``
+    and go into an expiry index (a heap of deadlines), so the cleanup thread
+    sleeps until the next deadline and deletes that one file instead of
+    sweeping whole directories. A full directory scan still runs every
+    ``scan_interval`` seconds (and once at startup) as a fallback for files
+    that were never registered, e.g. left over from a previous run. With
+    ``max_bytes`` the oldest files past their active period are deleted
+    early to keep the indexed files under that size. Files found by a scan
+    (rather than registered) are re-checked before deletion, so a file that
+    is still being written to is kept until it has been left alone for the
+    retention period.
+
+    Only generated audio is managed by default. Transcripts (live, rotated
+    and metrics logs) are kept open for a whole session and are the
+    program's output, so ``transcripts/`` is not swept.
+    """
+
+    def __init__(self, retention_minutes=1, max_bytes=None, scan_interval=3600,
+                 directories=("audio_clips",)):
         self.retention_period = timedelta(minutes=retention_minutes)
+        self.retention_seconds = self.retention_period.total_seconds()
+        self.max_bytes = max_bytes
+        self.scan_interval = scan_interval
+        self.directories = directories
         self.cleanup_thread = None
         self.running = False
-        self.active_files = {}  # Changed to dict to store expiration times
-        
+        self.cond = threading.Condition()
+        self.active_files = {}  # path -> epoch seconds the file is in use until
+        self.deadlines = {}     # path -> epoch seconds the file may be deleted at
+        self.sizes = {}         # path -> bytes, for the disk cap
+        self.total_bytes = 0
+        self.expiry_heap = []   # (deadline, path); entries whose deadline changed are skipped
+        self.scanned = set()    # indexed paths nobody registered; their deadline follows mtime
+        self.protected_dirs = set()  # Directories owned by other components (e.g. the TTS cache)
+
+        # Statistics
+        self.removed = 0
+        self.removed_for_cap = 0
+        self.scans = 0
+
         # Ensure required directories exist
-        os.makedirs("audio_clips", exist_ok=True)
-        os.makedirs("transcripts", exist_ok=True)
+        for directory in self.directories:
+            os.makedirs(directory, exist_ok=True)
+
+    def _schedule(self, filepath, deadline):
+        """Index a file under the lock; returns True if the cleanup thread should wake"""
+        self.deadlines[filepath] = deadline
+        heapq.heappush(self.expiry_heap, (deadline, filepath))
+        if filepath not in self.sizes:
+            try:
+                size = os.path.getsize(filepath)
+            except OSError:
+                size = 0
+            self.sizes[filepath] = size
+            self.total_bytes += size
+        return self.expiry_heap[0][1] == filepath or self._over_cap()
+
+    def _forget(self, filepath):
+        self.scanned.discard(filepath)
+        self.deadlines.pop(filepath, None)
+        self.active_files.pop(filepath, None)
+        self.total_bytes -= self.sizes.pop(filepath, 0)
+
+    def _over_cap(self):
+        return self.max_bytes is not None and self.total_bytes > self.max_bytes
 
     def mark_file_active(self, filepath, duration_minutes=1):
-        """Mark a file as currently in use"""
+        """Mark a file as currently in use and index it for deletion after its retention"""
+        filepath = os.path.abspath(filepath)
+        now = time.time()
+        active_until = now + duration_minutes * 60
+        with self.cond:
+            self.scanned.discard(filepath)
+            self.active_files[filepath] = max(active_until, self.active_files.get(filepath, 0))
+            deadline = max(now + self.retention_seconds, self.active_files[filepath])
+            if self._schedule(filepath, deadline):
+                self.cond.notify_all()
+        print(f"File {filepath} marked active until {datetime.fromtimestamp(active_until)}")
+
+    def protect_directory(self, directory):
+        """Exclude a directory from retention sweeps"""
+        with self.cond:
+            self.protected_dirs.add(os.path.abspath(directory))
+
+    def is_protected(self, filepath):
+        """Check if a path lives in (or is) a protected directory"""
         filepath = os.path.abspath(filepath)
-        expiration_time = datetime.now() + timedelta(minutes=duration_minutes)
-        self.active_files[filepath] = expiration_time
-        print(f"File {filepath} marked active until {expiration_time}")
+        with self.cond:
+            return any(filepath == d or filepath.startswith(d + os.sep) for d in self.protected_dirs)
 
     def is_file_active(self, filepath):
         """Check if a file is still active"""
         filepath = os.path.abspath(filepath)
-        if filepath not in self.active_files:
+        with self.cond:
+            active_until = self.active_files.get(filepath)
+            if active_until is None:
+                return False
+            if time.time() > active_until:
+                del self.active_files[filepath]
+                return False
+            return True
+
+    def _remove(self, filepath, reason="stale"):
+        try:
+            os.remove(filepath)
+            with self.cond:
+                self.removed += 1
+            print(f"Removed {reason} file: {os.path.basename(filepath)}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error removing {filepath}: {e}")
+
+    def _rescheduled(self, filepath, now):
+        """Re-index an unregistered file that was modified since it was indexed.
+
+        Returns True if it got a later deadline and must not be deleted yet.
+        """
+        if filepath not in self.scanned:
             return False
-        
-        now = datetime.now()
-        expiration_time = self.active_files[filepath]
-        
-        if now > expiration_time:
-            del self.active_files[filepath]
+        try:
+            stat = os.stat(filepath)
+        except OSError:
             return False
-            
+        deadline = stat.st_mtime + self.retention_seconds
+        if deadline <= now:
+            return False
+        self.total_bytes += stat.st_size - self.sizes.get(filepath, 0)
+        self.sizes[filepath] = stat.st_size
+        self._schedule(filepath, deadline)
         return True
 
+    def _pop_due(self, now):
+        """Take files whose deadline has passed (and files over the disk cap) off the index"""
+        due = []
+        while self.expiry_heap:
+            deadline, filepath = self.expiry_heap[0]
+            if self.deadlines.get(filepath) != deadline:
+                heapq.heappop(self.expiry_heap)  # superseded entry
+                continue
+            if deadline > now:
+                break
+            heapq.heappop(self.expiry_heap)
+            if self._rescheduled(filepath, now):
+                continue
+            self._forget(filepath)
+            due.append((filepath, "stale"))
+
+        if self._over_cap():
+            # Earliest deadlines first, skipping files that are still in use
+            for deadline, filepath in sorted(self.expiry_heap):
+                if not self._over_cap():
+                    break
+                if self.deadlines.get(filepath) != deadline or self.active_files.get(filepath, 0) > now:
+                    continue
+                if filepath in self.scanned and self._rescheduled(filepath, now):
+                    continue  # still being written to
+                self._forget(filepath)
+                self.removed_for_cap += 1
+                due.append((filepath, "over-cap"))
+        return due
+
     def cleanup_files(self, directory):
-        """Remove old files from the specified directory"""
+        """Scan a directory for unindexed files: remove expired ones, index the rest"""
         # Ensure directory exists
         os.makedirs(directory, exist_ok=True)
-        
-        now = datetime.now()
-        for filename in os.listdir(directory):
-            filepath = os.path.join(directory, filename)
-            if self.is_file_active(filepath):
+
+        now = time.time()
+        for entry in os.scandir(directory):
+            filepath = os.path.abspath(entry.path)
+            if not entry.is_file() or self.is_protected(filepath):
                 continue
-                
+            with self.cond:
+                if filepath in self.deadlines:
+                    continue  # already indexed
             try:
-                mtime = datetime.fromtimestamp(os.path.getmtime(filepath))
-                age = now - mtime
-                
-                if age > self.retention_period:
-                    os.remove(filepath)
-                    print(f"Removed stale file: {filename}")
+                deadline = entry.stat().st_mtime + self.retention_seconds
+            except OSError as e:
+                print(f"Error processing {entry.name}: {e}")
+                continue
+            if deadline <= now:
+                self._remove(filepath)
+            else:
+                with self.cond:
+                    self.scanned.add(filepath)
+                    self._schedule(filepath, deadline)
+
+    def scan(self):
+        """Full fallback sweep over the managed directories"""
+        self.scans += 1
+        for directory in self.directories:
+            try:
+                self.cleanup_files(directory)
             except Exception as e:
-                print(f"Error processing {filename}: {e}")
+                print(f"Error during cleanup of {directory}: {e}")
 
     def cleanup_worker(self):
-        """Background worker to periodically clean up files"""
+        """Background worker: delete files at their deadlines, rescan occasionally"""
+        next_scan = 0.0
         while self.running:
-            try:
-                # Clean up both transcripts and audio clips directories
-                self.cleanup_files("transcripts")
-                self.cleanup_files("audio_clips")
-            except Exception as e:
-                print(f"Error during cleanup: {e}")
-            
-            # Sleep for 1 hour before next cleanup
-            time.sleep(3600)
+            now = time.time()
+            if now >= next_scan:
+                self.scan()
+                next_scan = time.time() + self.scan_interval
+
+            with self.cond:
+                due = self._pop_due(time.time())
+                if not due:
+                    wake_at = next_scan
+                    if self.expiry_heap:
+                        wake_at = min(wake_at, self.expiry_heap[0][0])
+                    if self.running:
+                        # Woken early by new files, the disk cap or shutdown
+                        self.cond.wait(max(0.0, wake_at - time.time()))
+
+            for filepath, reason in due:
+                self._remove(filepath, reason)
+
+    def get_stats(self):
+        """Return index size and deletion counters"""
+        with self.cond:
+            return {
+                "indexed_files": len(self.deadlines),
+                "indexed_bytes": self.total_bytes,
+                "removed": self.removed,
+                "removed_for_cap": self.removed_for_cap,
+                "scans": self.scans,
+            }
 
     def start_cleanup_thread(self):
         """Start the background cleanup thread"""
@@ -81,7 +247,9 @@ class FileManager:
     def stop_cleanup_thread(self):
         """Stop the background cleanup thread"""
         print("Stopping file cleanup thread...")
-        self.running = False
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
         if self.cleanup_thread:
             try:
                 print("Waiting for cleanup thread to finish...")
@@ -91,4 +259,4 @@ class FileManager:
             except Exception as e:
                 print(f"Error stopping cleanup thread: {e}")
             self.cleanup_thread = None
-        print("File cleanup stopped")
\ No newline at end of file
+        print("File cleanup stopped")
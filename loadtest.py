@@ -0,0 +1,158 @@
+"""Load test for stream_server.py with simulated WebSocket clients.
+
+Starts the stream server in-process (or targets a running one with
+``--url``), then runs rounds of N concurrent clients that each stream a
+WAV fixture at real time. Every audio block gets one reply, so the time
+from sending a block to its reply is the recognition latency a speaker
+would see. The highest session count whose p90 latency stays under
+``--max-latency`` is reported as sessions per core:
+
+    python loadtest.py --model vosk-model-small-en-us --sessions 1 2 4 8 16 fixtures/a.wav
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from collections import deque
+
+from benchmark import load_fixture, percentiles, format_ms, SAMPLE_RATE
+
+def make_test_audio(seconds, samplerate=SAMPLE_RATE):
+    """Speech-like bursts of noise and silence for runs without a fixture"""
+    import numpy as np
+    rng = np.random.default_rng(0)
+    samples = rng.normal(0, 3000, int(seconds * samplerate))
+    envelope = (np.arange(len(samples)) // samplerate) % 3 != 2  # 2 s on, 1 s off
+    return (samples * envelope).astype(np.int16).tobytes()
+
+async def run_client(url, pcm, blocksize, samplerate=SAMPLE_RATE):
+    """Stream ``pcm`` at real time; returns per-block reply latencies or None if refused"""
+    from websockets.asyncio.client import connect
+    from websockets.exceptions import ConnectionClosed
+
+    block_bytes = blocksize * 2
+    block_duration = blocksize / float(samplerate)
+    sent = deque()
+    latencies = []
+    try:
+        async with connect(url, max_size=2 ** 22) as ws:
+            await ws.send(json.dumps({"samplerate": samplerate}))
+            ready = json.loads(await ws.recv())
+            if ready.get("type") != "ready":
+                return None
+
+            async def receive():
+                async for message in ws:
+                    if isinstance(message, bytes):
+                        continue
+                    reply = json.loads(message)
+                    if reply["type"] in ("partial", "final") and sent:
+                        latencies.append(time.perf_counter() - sent.popleft())
+                        if not sent and done.is_set():
+                            return
+
+            done = asyncio.Event()
+            receiver = asyncio.ensure_future(receive())
+            start = time.perf_counter()
+            for i, offset in enumerate(range(0, len(pcm), block_bytes)):
+                delay = start + i * block_duration - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                sent.append(time.perf_counter())
+                await ws.send(pcm[offset:offset + block_bytes])
+            sent.append(time.perf_counter())
+            done.set()
+            await ws.send(json.dumps({"type": "eof"}))
+            await asyncio.wait_for(receiver, timeout=60)
+    except ConnectionClosed as e:
+        if e.rcvd and e.rcvd.code == 1013:
+            return None
+        raise
+    return latencies
+
+async def run_round(url, pcm, sessions, blocksize):
+    results = await asyncio.gather(*(run_client(url, pcm, blocksize) for _ in range(sessions)),
+                                   return_exceptions=True)
+    latencies, refused, failed = [], 0, 0
+    for result in results:
+        if result is None:
+            refused += 1
+        elif isinstance(result, Exception):
+            failed += 1
+        else:
+            latencies.extend(result)
+    return {"sessions": sessions, "refused": refused, "failed": failed, "latencies": latencies}
+
+def start_local_server(model_path, port, max_sessions, workers, max_pending):
+    """Run a StreamServer on a background event loop; returns the server"""
+    from transcription import load_model
+    from stream_server import StreamServer
+
+    server = StreamServer(load_model(model_path), max_sessions=max_sessions, workers=workers,
+                          max_pending=max_pending)
+    ready = threading.Event()
+    thread = threading.Thread(target=lambda: asyncio.run(server.serve("127.0.0.1", port, ready=ready)),
+                              daemon=True)
+    thread.start()
+    if not ready.wait(timeout=30):
+        raise RuntimeError("stream server did not start")
+    return server
+
+def run_load_test(url, pcm, session_counts, blocksize=1600, max_latency=0.5):
+    """Run one round per session count and return the per-round results"""
+    rounds = []
+    for sessions in session_counts:
+        result = asyncio.run(run_round(url, pcm, sessions, blocksize))
+        p = percentiles(result["latencies"])
+        result["p50"], result["p90"], result["p99"] = p[50], p[90], p[99]
+        result["ok"] = (not result["refused"] and not result["failed"]
+                        and p[90] is not None and p[90] <= max_latency)
+        rounds.append(result)
+        print(f"{sessions:>8}{format_ms(p[50]):>10}{format_ms(p[90]):>10}{format_ms(p[99]):>10}"
+              f"{result['refused']:>9}{result['failed']:>8}  {'ok' if result['ok'] else 'overloaded'}")
+        if not result["ok"]:
+            break
+    return rounds
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulated-client load test for stream_server.py")
+    parser.add_argument("fixture", nargs="?", help="Mono 16-bit 16 kHz WAV each client streams (default: synthetic)")
+    parser.add_argument("--url", default=None, help="Target a running server instead of starting one")
+    parser.add_argument("--model", default="vosk-model-small-en-us", help="Path to Vosk model folder")
+    parser.add_argument("--port", type=int, default=2801, help="Port for the in-process server")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32],
+                        help="Concurrent session counts to try, in order")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Synthetic audio length per client")
+    parser.add_argument("--blocksize", type=int, default=1600, help="Frames per audio block")
+    parser.add_argument("--workers", type=int, default=None, help="Recognizer threads (default: CPU count)")
+    parser.add_argument("--max-pending", type=int, default=8, help="Audio blocks buffered per session")
+    parser.add_argument("--max-latency", type=float, default=0.5, help="p90 reply latency (s) that still counts as keeping up")
+    parser.add_argument("--json", help="Also write raw results to this JSON file")
+    args = parser.parse_args()
+
+    pcm = load_fixture(args.fixture) if args.fixture else make_test_audio(args.seconds)
+    server = None
+    url = args.url
+    if not url:
+        server = start_local_server(args.model, args.port, max(args.sessions), args.workers, args.max_pending)
+        url = f"ws://127.0.0.1:{args.port}"
+
+    print(f"\n{'sessions':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'refused':>9}{'failed':>8}")
+    rounds = run_load_test(url, pcm, args.sessions, blocksize=args.blocksize, max_latency=args.max_latency)
+
+    cores = os.cpu_count() or 1
+    sustained = max((r["sessions"] for r in rounds if r["ok"]), default=0)
+    print(f"\nSustained {sustained} real-time sessions on {cores} cores: {sustained / cores:.2f} sessions per core")
+    if server:
+        stats = server.get_stats()
+        if stats["audio_seconds"]:
+            print(f"Recognizer cost: {stats['recognizer_seconds'] / stats['audio_seconds']:.3f} CPU s per audio s, "
+                  f"{stats['backpressure_waits']} backpressure waits")
+        server.close()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump({"cores": cores, "sustained_sessions": sustained, "rounds": rounds}, fh, indent=2)
+    sys.exit(0 if sustained else 1)
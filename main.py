@@ -1,29 +1,65 @@
-from transcript_to_tts import text_to_speech, initialize, list_audio_devices, cleanup
-from transcription import main as transcribe_audio
-import os
+from metrics import metrics
+import argparse
+import json
 import sys
+import time
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 import atexit
 
-def process_transcription(text):
-    """Handle completed transcription by converting it to speech"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+# pygame, sounddevice, vosk and the TTS backends are imported lazily so the
+# model can start loading before they are, and --help stays instant.
+
+LOW_LATENCY_BLOCKSIZE = 800  # 50 ms at 16 kHz
+
+class StartupTimer:
+    """Collects how long each startup phase took"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self.lock:
+            self.phases.append((name, seconds))
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def report(self):
+        print("\nStartup timing:")
+        with self.lock:
+            for name, seconds in self.phases:
+                print(f"  {name:<28}{seconds * 1000:8.1f} ms")
+        print(f"  {'total':<28}{(time.perf_counter() - self.started) * 1000:8.1f} ms")
+
+def process_transcription(text, trace=None):
+    """Handle completed transcription by handing it to the TTS workers"""
+    from transcript_to_tts import speak
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
     output_file = f'audio_clips/transcript_{timestamp}.mp3'
-    os.makedirs('audio_clips', exist_ok=True)
-    text_to_speech(text, output_file=output_file)
+    speak(text, output_file=output_file, trace=trace)
 
 def setup_audio_output():
     """Set up the audio output device"""
+    from transcript_to_tts import list_audio_devices
     print("\nSetting up audio output...")  # Debug line
     devices = list_audio_devices()
-    
+
     if not devices:
         print("No audio output devices found!")
         sys.exit(1)
-    
+
     print("\nPlease select an output device:")
     device_id = input("Enter device number (or press Enter for default): ").strip()
-    
+
     if device_id:
         try:
             device_id = int(device_id)
@@ -34,32 +70,154 @@ def setup_audio_output():
     else:
         print("Using default device")  # Debug line
         device_id = None
-    
+
     return device_id
 
+def load_model_in_background(model_path, timer):
+    """Start loading the Vosk model on a thread; returns (thread, result dict)"""
+    result = {}
+
+    def load():
+        started = time.perf_counter()
+        try:
+            import transcription
+            result["model"] = transcription.load_model(model_path)
+        except BaseException as e:  # includes SystemExit when no model is found
+            result["error"] = e
+        timer.record("model load (background)", time.perf_counter() - started)
+
+    thread = threading.Thread(target=load, name="model-loader", daemon=True)
+    thread.start()
+    return thread, result
+
+def parse_output_spec(spec):
+    """Parse DEVICE[:GAIN_DB[:DELAY_MS]] into a FanoutPlayer output dict"""
+    parts = str(spec).split(":")
+    output = {"device": int(parts[0])}
+    if len(parts) > 1 and parts[1]:
+        output["gain_db"] = float(parts[1])
+    if len(parts) > 2 and parts[2]:
+        output["delay_ms"] = float(parts[2])
+    return output
+
+def load_config(path):
+    """Read a JSON config whose keys are option names (e.g. "output_device")"""
+    with open(path, "r", encoding="utf-8") as fh:
+        return {key.replace("-", "_"): value for key, value in json.load(fh).items()}
+
 if __name__ == "__main__":
+    timer = StartupTimer()
+    config_parser = argparse.ArgumentParser(add_help=False)
+    config_parser.add_argument("--config", default=None, metavar="FILE",
+                               help="JSON file with defaults for any option below")
+    config_args, _ = config_parser.parse_known_args()
+
+    parser = argparse.ArgumentParser(description="Voice -> transcription -> TTS relay", parents=[config_parser])
+    parser.add_argument("--model", default="vosk-model-small-en-us", help="Path to Vosk model folder")
+    parser.add_argument("--input-device", type=int, default=None, help="Input device index (default: system default)")
+    parser.add_argument("--output-device", type=int, default=None, help="Output device index (skips the prompt)")
+    parser.add_argument("--native-rate", action="store_true",
+                        help="Capture at the input device's own rate/channels and resample in-process")
+    parser.add_argument("--fanout", nargs="+", default=None, metavar="DEVICE[:GAIN_DB[:DELAY_MS]]",
+                        help="Play to several output devices at once (decoding each clip once)")
+    parser.add_argument("--headless", action="store_true",
+                        help="Never prompt; use the default output device unless --output-device is given")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this local port")
+    parser.add_argument("--metrics-file", default=None, help="Append per-utterance latency traces to this JSONL file")
+    parser.add_argument("--blocksize", type=int, default=None,
+                        help=f"Frames per capture block (default 4000, {LOW_LATENCY_BLOCKSIZE} with --low-latency)")
+    parser.add_argument("--low-latency", action="store_true",
+                        help="Small capture blocks and speculative TTS on stable partial results")
+    parser.add_argument("--prewarm", default=None, metavar="FILE",
+                        help="Phrase list (one per line) to synthesize at startup and keep in memory")
+    parser.add_argument("--prewarm-mb", type=float, default=16, help="Memory budget for prewarmed phrases")
+    parser.add_argument("--coalesce-ms", type=float, default=None,
+                        help="Merge finals arriving within this many ms (or while speech is playing) into one TTS request")
+    parser.add_argument("--coalesce-max-ms", type=float, default=1500,
+                        help="Longest a final may be held for merging (default 1500)")
+    parser.add_argument("--max-lag", type=float, default=None, metavar="SECONDS",
+                        help="Drop or cut off speech that would play more than this far behind the speaker")
+    parser.add_argument("--no-preempt", action="store_true",
+                        help="With --max-lag, only drop stale clips; never cut off one that is playing")
+    parser.add_argument("--catch-up", type=float, default=None, metavar="SECONDS",
+                        help="Play slightly faster while playback is more than this far behind")
+    parser.add_argument("--recognizer-server", default=None, metavar="HOST:PORT",
+                        help="Use a running recognizer_server.py instead of loading the model")
+    if config_args.config:
+        parser.set_defaults(**load_config(config_args.config))
+    args = parser.parse_args()
+
+    transcribe_options = {}
+    blocksize = args.blocksize or (LOW_LATENCY_BLOCKSIZE if args.low_latency else None)
+    if blocksize:
+        transcribe_options["blocksize"] = blocksize
+    if args.native_rate:
+        transcribe_options["native_rate"] = True
+
+    cleanup = None
     try:
+        # Export per-utterance traces and pipeline counters
+        if args.metrics_port is not None:
+            metrics.start_http_server(args.metrics_port)
+        if args.metrics_file:
+            metrics.open_jsonl(args.metrics_file)
+
+        # The model loads while the audio output and TTS are set up
+        loader = None
+        if not args.recognizer_server:
+            loader, loaded = load_model_in_background(args.model, timer)
+
+        with timer.phase("import audio/TTS modules"):
+            from transcript_to_tts import on_partial, initialize, cleanup
+            from transcription import main as transcribe_audio
+            from phrase_store import load_phrases
+
         # Set up audio output
-        device_id = setup_audio_output()
-        
+        device_id = args.output_device
+        player = None
+        if args.fanout:
+            from fanout_player import FanoutPlayer
+            player = FanoutPlayer([parse_output_spec(spec) for spec in args.fanout])
+        elif device_id is None and not args.headless:
+            with timer.phase("device prompt (interactive)"):
+                device_id = setup_audio_output()
+
         # Initialize audio and file management systems
-        initialize(device_id=device_id, retention_minutes=1)
-        
+        with timer.phase("audio output + TTS init"):
+            initialize(device_id=device_id, retention_minutes=1, speculative=args.low_latency, player=player,
+                       prewarm_phrases=load_phrases(args.prewarm) if args.prewarm else None,
+                       prewarm_budget=int(args.prewarm_mb * 1024 * 1024),
+                       coalesce_window=args.coalesce_ms / 1000.0 if args.coalesce_ms is not None else None,
+                       coalesce_max_hold=args.coalesce_max_ms / 1000.0,
+                       max_lag=args.max_lag, preempt=not args.no_preempt, catch_up_threshold=args.catch_up)
+
         # Register cleanup function for normal program exit
         atexit.register(cleanup)
-        
+
+        if loader:
+            with timer.phase("waiting for model"):
+                loader.join()
+            if "error" in loaded:
+                raise loaded["error"]
+            transcribe_options["model"] = loaded["model"]
+        timer.report()
+
         # Start transcription
         try:
-            transcribe_audio(callback_fn=process_transcription)
+            transcribe_audio(callback_fn=process_transcription, device=args.input_device,
+                             partial_fn=on_partial if args.low_latency else None,
+                             server=args.recognizer_server, **transcribe_options)
         except KeyboardInterrupt:
             print("\nReceived keyboard interrupt, shutting down...")
-        
+
     except Exception as e:
         print(f"\nError during execution: {e}")
     finally:
         # Ensure cleanup runs even if there's an error during setup
-        try:
-            cleanup()
-            atexit.unregister(cleanup)  # Prevent duplicate cleanup
-        except Exception as e:
-            print(f"Error during cleanup: {e}")
\ No newline at end of file
+        if cleanup:
+            try:
+                cleanup()
+                atexit.unregister(cleanup)  # Prevent duplicate cleanup
+            except Exception as e:
+                print(f"Error during cleanup: {e}")
+        metrics.close()
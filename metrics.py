@@ -0,0 +1,209 @@
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Pipeline stages an utterance passes through
+STAGES = ("audio_captured", "final_result", "tts_start", "tts_end", "enqueued",
+          "playback_start", "playback_end")
+
+# Latency spans reported per trace: name -> (from stage, to stage)
+SPANS = {
+    "capture_to_final": ("audio_captured", "final_result"),
+    "final_to_tts_start": ("final_result", "tts_start"),
+    "tts": ("tts_start", "tts_end"),
+    "final_to_enqueued": ("final_result", "enqueued"),
+    "enqueued_to_playback": ("enqueued", "playback_start"),
+    "playback": ("playback_start", "playback_end"),
+    "end_to_end": ("audio_captured", "playback_start"),
+}
+
+METRIC_PREFIX = "voice_tts_"
+
+class Trace:
+    """Timestamps (wall clock, seconds) of one utterance moving through the pipeline"""
+
+    def __init__(self, registry, trace_id, text=None):
+        self.registry = registry
+        self.trace_id = trace_id
+        self.text = text
+        self.stages = {}
+        self.clips_pending = 1   # clips that still have to finish playing
+        self.finished = False
+        self.lock = threading.Lock()
+
+    def mark(self, stage, timestamp=None, overwrite=True):
+        """Record when the utterance reached a stage"""
+        with self.lock:
+            if overwrite or stage not in self.stages:
+                self.stages[stage] = timestamp if timestamp is not None else time.time()
+
+    def clip_played(self, timestamp=None):
+        """Record the end of one clip; the trace completes after the last one"""
+        self.mark("playback_end", timestamp)
+        with self.lock:
+            self.clips_pending -= 1
+            done = self.clips_pending <= 0
+        if done:
+            self.finish()
+
+    def durations(self):
+        """Seconds spent in each latency span whose stages were both recorded"""
+        with self.lock:
+            stages = dict(self.stages)
+        return {name: stages[end] - stages[start] for name, (start, end) in SPANS.items()
+                if start in stages and end in stages}
+
+    def finish(self):
+        """Hand the completed trace to the registry (once)"""
+        with self.lock:
+            if self.finished:
+                return
+            self.finished = True
+        self.registry.record_trace(self)
+
+    def to_dict(self):
+        with self.lock:
+            stages = dict(self.stages)
+        return {"type": "trace", "trace_id": self.trace_id, "text": self.text,
+                "stages": stages, "durations": self.durations()}
+
+class MetricsRegistry:
+    """Counters, gauges and per-stage latency totals with Prometheus/JSONL export"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.gauge_fns = {}
+        self.stage_totals = {}   # span -> [count, sum, max]
+        self.trace_ids = itertools.count(1)
+        self.session = uuid.uuid4().hex[:8]
+        self.jsonl_fh = None
+        self.http_server = None
+
+    # -- counters and gauges -------------------------------------------------
+
+    def incr(self, name, value=1):
+        """Increase a counter"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """Set a gauge to a value"""
+        with self.lock:
+            self.gauges[name] = value
+
+    def register_gauge(self, name, fn):
+        """Register a callable that is sampled whenever metrics are exported"""
+        with self.lock:
+            self.gauge_fns[name] = fn
+
+    def snapshot(self):
+        """Current counter and gauge values"""
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            gauge_fns = dict(self.gauge_fns)
+            stage_totals = {k: list(v) for k, v in self.stage_totals.items()}
+        for name, fn in gauge_fns.items():
+            try:
+                gauges[name] = fn()
+            except Exception:
+                pass
+        return {"counters": counters, "gauges": gauges, "stages": stage_totals}
+
+    # -- traces ----------------------------------------------------------------
+
+    def start_trace(self, text=None):
+        """Create a trace for a new utterance"""
+        trace_id = f"{self.session}-{next(self.trace_ids)}"
+        return Trace(self, trace_id, text=text)
+
+    def record_trace(self, trace):
+        """Fold a completed trace into stage totals and the JSONL log"""
+        record = trace.to_dict()
+        with self.lock:
+            self.counters["traces_completed"] = self.counters.get("traces_completed", 0) + 1
+            for span, seconds in record["durations"].items():
+                totals = self.stage_totals.setdefault(span, [0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += seconds
+                totals[2] = max(totals[2], seconds)
+            if self.jsonl_fh:
+                try:
+                    self.jsonl_fh.write(json.dumps(record) + "\n")
+                    self.jsonl_fh.flush()
+                except (IOError, ValueError) as e:
+                    print(f"Error writing metrics file: {e}")
+
+    # -- export ----------------------------------------------------------------
+
+    def export_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        snap = self.snapshot()
+        lines = []
+        for name, value in sorted(snap["counters"].items()):
+            metric = f"{METRIC_PREFIX}{name}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name, value in sorted(snap["gauges"].items()):
+            metric = f"{METRIC_PREFIX}{name}"
+            lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+        if snap["stages"]:
+            metric = f"{METRIC_PREFIX}stage_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for span, (count, total, peak) in sorted(snap["stages"].items()):
+                lines.append(f'{metric}_count{{stage="{span}"}} {count}')
+                lines.append(f'{metric}_sum{{stage="{span}"}} {total:.6f}')
+                lines.append(f'{metric}_max{{stage="{span}"}} {peak:.6f}')
+        return "\n".join(lines) + "\n"
+
+    def open_jsonl(self, path):
+        """Append completed traces (and a final metrics snapshot) to a JSONL file"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.jsonl_fh = open(path, "a", encoding="utf-8")
+        print(f"Writing latency traces to: {path}")
+
+    def start_http_server(self, port, host="127.0.0.1"):
+        """Serve the Prometheus text format at http://host:port/metrics"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.export_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.http_server = ThreadingHTTPServer((host, port), Handler)
+        self.http_server.daemon_threads = True
+        threading.Thread(target=self.http_server.serve_forever, daemon=True).start()
+        print(f"Serving metrics at http://{host}:{self.http_server.server_address[1]}/metrics")
+
+    def close(self):
+        """Stop the HTTP endpoint and close the JSONL file"""
+        if self.http_server:
+            self.http_server.shutdown()
+            self.http_server.server_close()
+            self.http_server = None
+        if self.jsonl_fh:
+            try:
+                self.jsonl_fh.write(json.dumps({"type": "metrics", "time": time.time(), **self.snapshot()}) + "\n")
+                self.jsonl_fh.close()
+            except (IOError, ValueError) as e:
+                print(f"Error closing metrics file: {e}")
+            self.jsonl_fh = None
+
+# Process-wide registry shared by all pipeline stages
+metrics = MetricsRegistry()
@@ -0,0 +1,100 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pygame import mixer
+from tts_cache import normalize_text
+
+def load_phrases(path):
+    """Read a phrase list: one phrase per line, blank lines and #comments ignored"""
+    with open(path, "r", encoding="utf-8") as fh:
+        return [line.strip() for line in fh if line.strip() and not line.lstrip().startswith("#")]
+
+def sound_bytes(sound):
+    """Memory held by a decoded mixer.Sound"""
+    freq, size, channels = mixer.get_init()
+    return int(sound.get_length() * freq) * channels * abs(size) // 8
+
+class PhraseStore:
+    """Resident clips for known phrases, decoded ahead of time.
+
+    ``prewarm`` synthesizes the phrase list in parallel and decodes each
+    clip into a mixer.Sound (when the mixer is running), so a matching
+    utterance is queued without synthesis or decoding. Phrases are matched
+    on normalized text. Clips that do not fit in ``max_bytes`` (encoded
+    plus decoded size) are skipped.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.clips = {}
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.failed = 0
+        self.prewarm_seconds = 0.0
+
+    def add(self, text, clip):
+        """Decode and keep a clip if it fits in the budget; returns True if stored"""
+        if mixer.get_init() and clip.decoded is None:
+            clip.decoded = mixer.Sound(file=clip.open())
+        size = len(clip) + (sound_bytes(clip.decoded) if clip.decoded is not None else 0)
+        with self.lock:
+            if self.total_bytes + size > self.max_bytes:
+                self.skipped += 1
+                return False
+            self.clips[normalize_text(text)] = clip
+            self.total_bytes += size
+        return True
+
+    def has(self, text):
+        """Check for a resident clip without counting a hit or miss"""
+        with self.lock:
+            return normalize_text(text) in self.clips
+
+    def get(self, text):
+        """Return the resident clip for an utterance, or None"""
+        with self.lock:
+            clip = self.clips.get(normalize_text(text))
+            if clip is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return clip
+
+    def prewarm(self, phrases, synth_fn, workers=4):
+        """Synthesize phrases in parallel with ``synth_fn(text)`` and store them.
+
+        ``synth_fn`` returns an AudioClip. Decoding happens on the calling
+        thread.
+        """
+        started = time.perf_counter()
+        phrases = list(dict.fromkeys(p for p in phrases if p.strip()))
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="tts-prewarm") as pool:
+            futures = {pool.submit(synth_fn, phrase): phrase for phrase in phrases}
+            for future in as_completed(futures):
+                phrase = futures[future]
+                try:
+                    self.add(phrase, future.result())
+                except Exception as e:
+                    self.failed += 1
+                    print(f"Error prewarming '{phrase}': {e}")
+        self.prewarm_seconds = time.perf_counter() - started
+        return self.get_stats()
+
+    def get_stats(self):
+        """Return prewarm timing, memory use and hit counters"""
+        with self.lock:
+            return {
+                "phrases": len(self.clips),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "skipped": self.skipped,
+                "failed": self.failed,
+                "prewarm_seconds": self.prewarm_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,235 @@
+"""Long-lived recognizer service that keeps the Vosk model resident.
+
+Loading a model takes seconds; creating a recognizer for it takes
+milliseconds. The server loads the model once and gives every client
+connection its own KaldiRecognizer, so restarting the capture side or
+opening a new session does not reload anything:
+
+    python recognizer_server.py --model vosk-model-small-en-us
+    python transcription.py --server 127.0.0.1:2700
+
+Protocol (TCP on localhost): each client frame is a one-byte type plus a
+4-byte big-endian length and payload; the server answers every frame with
+one JSON line.
+
+- ``H`` hello, JSON ``{"samplerate": 16000, "words": true}``
+- ``A`` audio, raw int16 PCM; reply ``{"accepted": bool, "result": {...}}``
+  (the final result if accepted, else the partial result)
+- ``F`` flush, reply ``{"result": {...}}`` from FinalResult()
+- ``R`` reset the recognizer
+- ``S`` status, reply with model and session counters
+"""
+import sys
+import json
+import time
+import socket
+import struct
+import argparse
+import threading
+import socketserver
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 2700
+
+FRAME_HEADER = struct.Struct(">cI")
+
+def send_frame(sock, kind, payload=b""):
+    sock.sendall(FRAME_HEADER.pack(kind, len(payload)) + bytes(payload))
+
+def read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) < size:
+        raise EOFError("connection closed")
+    return data
+
+def parse_address(address):
+    """Turn 'host:port' or 'port' into a (host, port) tuple"""
+    host, _, port = str(address).rpartition(":")
+    return host or DEFAULT_HOST, int(port)
+
+class RecognizerServer(socketserver.ThreadingTCPServer):
+    """Serves recognition sessions from one preloaded model"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, model, model_path=None, host=DEFAULT_HOST, port=DEFAULT_PORT, load_seconds=0.0):
+        from vosk import KaldiRecognizer
+        self.recognizer_cls = KaldiRecognizer
+        self.model = model
+        self.model_path = model_path
+        self.load_seconds = load_seconds
+        self.lock = threading.Lock()
+        self.sessions_active = 0
+        self.sessions_served = 0
+        super().__init__((host, port), SessionHandler)
+
+    def session_started(self):
+        with self.lock:
+            self.sessions_active += 1
+            self.sessions_served += 1
+
+    def session_ended(self):
+        with self.lock:
+            self.sessions_active -= 1
+
+    def get_status(self):
+        with self.lock:
+            return {
+                "model_path": self.model_path,
+                "model_load_seconds": self.load_seconds,
+                "sessions_active": self.sessions_active,
+                "sessions_served": self.sessions_served,
+            }
+
+class SessionHandler(socketserver.StreamRequestHandler):
+    """One client connection = one recognizer over the shared model"""
+
+    def reply(self, message):
+        self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        server = self.server
+        server.session_started()
+        rec = None
+        try:
+            while True:
+                try:
+                    kind, size = FRAME_HEADER.unpack(read_exact(self.rfile, FRAME_HEADER.size))
+                    payload = read_exact(self.rfile, size)
+                except EOFError:
+                    return
+
+                if kind == b"A":
+                    if rec is None:
+                        self.reply({"error": "audio before hello"})
+                        continue
+                    accepted = rec.AcceptWaveform(payload)
+                    raw = rec.Result() if accepted else rec.PartialResult()
+                    self.reply({"accepted": bool(accepted), "result": json.loads(raw)})
+                elif kind == b"H":
+                    options = json.loads(payload or b"{}")
+                    started = time.perf_counter()
+                    rec = server.recognizer_cls(server.model, options.get("samplerate", 16000))
+                    if options.get("words", True):
+                        rec.SetWords(True)
+                    self.reply({"ok": True, "session_setup_seconds": time.perf_counter() - started})
+                elif kind == b"F":
+                    self.reply({"result": json.loads(rec.FinalResult()) if rec else {"text": ""}})
+                elif kind == b"R":
+                    if rec:
+                        rec.Reset()
+                    self.reply({"ok": True})
+                elif kind == b"S":
+                    self.reply(server.get_status())
+                else:
+                    self.reply({"error": f"unknown frame type {kind!r}"})
+        except (ConnectionError, OSError):
+            pass
+        except Exception as e:
+            # Malformed JSON or a recognizer error: tell the client and end this session only
+            print(f"Closing session after error: {e}", file=sys.stderr)
+            try:
+                self.reply({"error": str(e)})
+            except OSError:
+                pass
+        finally:
+            server.session_ended()
+
+class RemoteRecognizer:
+    """Client for RecognizerServer with the KaldiRecognizer interface.
+
+    ``transcription.main`` uses it in place of a local recognizer: every
+    AcceptWaveform call streams one block to the server and gets back the
+    final or partial result in the same round trip, so Result() and
+    PartialResult() need no extra request.
+    """
+
+    def __init__(self, address, samplerate=16000, words=True, timeout=10.0):
+        started = time.perf_counter()
+        self.sock = socket.create_connection(parse_address(address), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+        self.last_final = {"text": ""}
+        self.last_partial = {"partial": ""}
+        self.request(b"H", json.dumps({"samplerate": samplerate, "words": words}).encode("utf-8"))
+        self.connect_seconds = time.perf_counter() - started
+
+    def request(self, kind, payload=b""):
+        send_frame(self.sock, kind, payload)
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("recognizer server closed the connection")
+        reply = json.loads(line)
+        if "error" in reply:
+            raise RuntimeError(f"recognizer server: {reply['error']}")
+        return reply
+
+    def SetWords(self, enabled):
+        pass  # chosen in the hello frame
+
+    def AcceptWaveform(self, data):
+        reply = self.request(b"A", data)
+        if reply["accepted"]:
+            self.last_final = reply["result"]
+        else:
+            self.last_partial = reply["result"]
+        return reply["accepted"]
+
+    def Result(self):
+        return json.dumps(self.last_final)
+
+    def PartialResult(self):
+        return json.dumps(self.last_partial)
+
+    def FinalResult(self):
+        return json.dumps(self.request(b"F")["result"])
+
+    def Reset(self):
+        self.request(b"R")
+
+    def status(self):
+        return self.request(b"S")
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+def serve(model_path, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Load the model once and serve recognition sessions until interrupted"""
+    from transcription import resolve_model_path, load_model
+
+    started = time.perf_counter()
+    resolved = resolve_model_path(model_path)
+    model = load_model(resolved)
+    load_seconds = time.perf_counter() - started
+    print(f"Loaded model from {resolved} in {load_seconds:.2f}s")
+
+    server = RecognizerServer(model, model_path=resolved, host=host, port=port, load_seconds=load_seconds)
+    print(f"Recognizer server listening on {host}:{server.server_address[1]}. Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping recognizer server...")
+    finally:
+        server.server_close()
+        status = server.get_status()
+        print(f"Served {status['sessions_served']} sessions")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep a Vosk model loaded and serve recognition over a local socket")
+    parser.add_argument("--model", default="vosk-model-small-en-us", help="Path to Vosk model folder")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to listen on (keep it local)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    args = parser.parse_args()
+
+    try:
+        serve(args.model, host=args.host, port=args.port)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
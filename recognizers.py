@@ -0,0 +1,323 @@
+"""Speech recognizer backends behind one streaming interface.
+
+An engine holds a loaded model and is shared by any number of streams.
+``engine.create_stream(samplerate)`` returns a recognizer with the
+KaldiRecognizer interface the rest of the pipeline already drives
+(``AcceptWaveform`` returns True when a final result is ready, and
+``Result``/``PartialResult``/``FinalResult`` return JSON strings), so
+transcription.main, the batch transcriber and stream_server.py work with
+every backend:
+
+- ``vosk``: one KaldiRecognizer per stream (partials and word timings).
+- ``transformers``: a Hugging Face speech-to-text model on the CPU. Streams
+  cut their audio into utterances with the voice activity gate and hand
+  finished utterances to one batching thread, which runs the model on up
+  to ``batch_size`` utterances from all streams at once.
+"""
+import os
+import json
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from vad import VoiceActivityGate
+from resample import StreamingResampler
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+def physical_cores():
+    """Physical CPU cores (hyper-threads do not speed up matrix math)"""
+    cores = psutil.cpu_count(logical=False) if psutil else None
+    return cores or os.cpu_count() or 1
+
+def configure_torch_threads(threads=None):
+    """Size torch's intra-op pool to the physical cores; returns the count used"""
+    import torch
+    threads = threads or physical_cores()
+    torch.set_num_threads(threads)
+    try:
+        # One batch runs at a time, so inter-op parallelism only adds contention
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already fixed once torch has run parallel work
+    return threads
+
+class RecognizerEngine:
+    """Base class for speech-to-text backends"""
+    name = "base"
+    zero_copy = False  # True if streams take vosk cffi buffers (transcription.as_waveform)
+
+    def create_stream(self, samplerate):
+        """Return a new recognizer stream with the KaldiRecognizer interface"""
+        raise NotImplementedError
+
+    def get_stats(self):
+        return {"engine": self.name}
+
+    def close(self):
+        """Release threads or other resources held by the engine"""
+        pass
+
+class VoskEngine(RecognizerEngine):
+    """Vosk/Kaldi: one streaming KaldiRecognizer per stream"""
+    name = "vosk"
+    zero_copy = True
+
+    def __init__(self, model_path=None, model=None):
+        if model is None:
+            from transcription import load_model
+            model = load_model(model_path)
+        from vosk import KaldiRecognizer
+        self.recognizer_cls = KaldiRecognizer
+        self.model = model
+
+    def create_stream(self, samplerate):
+        rec = self.recognizer_cls(self.model, samplerate)
+        rec.SetWords(True)  # include word timing info if supported
+        return rec
+
+class SegmentStream:
+    """One audio stream of a TransformersEngine, with the KaldiRecognizer interface.
+
+    Audio is cut into ``frame_ms`` frames for the voice activity gate;
+    speech is collected until the gate reports the end of the utterance (or
+    ``max_segment`` seconds have built up) and the utterance is submitted to
+    the engine. ``AcceptWaveform`` never waits for the model: it returns
+    True once an earlier utterance has been recognized. Results carry the
+    utterance's ``start``/``end`` in seconds from the start of the stream;
+    ``end`` is where speech stopped, before the gate's trailing hangover.
+    Sequence models give no partial results.
+    """
+
+    def __init__(self, engine, samplerate, frame_ms=100, max_segment=15.0, vad=None):
+        self.engine = engine
+        self.samplerate = samplerate
+        self.frame_bytes = int(samplerate * frame_ms / 1000) * 2
+        self.max_segment_bytes = int(max_segment * samplerate) * 2
+        self.gate = VoiceActivityGate(sample_rate=samplerate, block_bytes=self.frame_bytes, **(vad or {}))
+        self.pending = bytearray()   # input not yet making up a whole frame
+        self.segment = bytearray()   # speech of the current utterance
+        self.segment_start = 0.0
+        self.position = 0.0          # seconds of audio gated so far
+        self.submitted = deque()     # (future, start, end) in utterance order
+        self.ready = deque()         # recognized results not yet returned
+
+    def SetWords(self, enabled):
+        pass  # no word timings from sequence models
+
+    def _frame(self, frame):
+        blocks, ended = self.gate.process(frame)
+        if blocks and not self.segment:
+            queued = sum(len(b) for b in blocks)
+            self.segment_start = self.position + len(frame) / 2.0 / self.samplerate - queued / 2.0 / self.samplerate
+        for block in blocks:
+            self.segment += block
+        self.position += len(frame) / 2.0 / self.samplerate
+        if ended or len(self.segment) >= self.max_segment_bytes:
+            self._submit(trailing=self.gate.silence_run)
+
+    def _submit(self, trailing=0.0):
+        """Send the utterance to the engine; ``trailing`` seconds of silence end it"""
+        if not self.segment:
+            return
+        samples = np.frombuffer(bytes(self.segment), dtype=np.int16)
+        # Report where speech ended, not the end of the gate's hangover, as Vosk's word times do
+        end = self.segment_start + len(samples) / float(self.samplerate) - trailing
+        self.submitted.append((self.engine.submit(samples, self.samplerate), self.segment_start, end))
+        self.segment = bytearray()
+
+    def _collect(self, wait=False):
+        while self.submitted and (wait or self.submitted[0][0].done()):
+            future, start, end = self.submitted.popleft()
+            try:
+                text = future.result()
+            except Exception as e:
+                print(f"Error recognizing utterance: {e}")
+                text = ""
+            self.ready.append({"text": text, "start": round(start, 3), "end": round(end, 3)})
+
+    def AcceptWaveform(self, data):
+        self.pending += data
+        offset = 0
+        while len(self.pending) - offset >= self.frame_bytes:
+            self._frame(memoryview(bytes(self.pending[offset:offset + self.frame_bytes])))
+            offset += self.frame_bytes
+        del self.pending[:offset]
+        self._collect()
+        return bool(self.ready)
+
+    def Result(self):
+        return json.dumps(self.ready.popleft() if self.ready else {"text": ""})
+
+    def PartialResult(self):
+        return json.dumps({"partial": ""})
+
+    def flush(self):
+        """Submit what is left of the stream and wait for it; returns the remaining results as JSON"""
+        if self.gate.in_speech and self.pending:
+            self.segment += self.pending
+        self.pending = bytearray()
+        self._submit(trailing=self.gate.silence_run if self.gate.in_speech else 0.0)
+        self._collect(wait=True)
+        results, self.ready = list(self.ready), deque()
+        return [json.dumps(r) for r in results]
+
+    def FinalResult(self):
+        """Like flush, but merges the remaining results into one (KaldiRecognizer semantics)"""
+        results = [json.loads(raw) for raw in self.flush()]
+        text = " ".join(r["text"] for r in results if r["text"])
+        final = {"text": text}
+        if results:
+            final["start"], final["end"] = results[0]["start"], results[-1]["end"]
+        return json.dumps(final)
+
+    def Reset(self):
+        self.pending = bytearray()
+        self.segment = bytearray()
+        self.ready.clear()
+
+class TransformersEngine(RecognizerEngine):
+    """Batched CPU speech-to-text with a Hugging Face transformers model.
+
+    ``model_path`` is a local model folder (or a hub id when online). CTC
+    models (wav2vec2, HuBERT, ...) are decoded greedily; encoder-decoder
+    models (Whisper, Speech2Text) with ``generate``. Utterances submitted
+    by all streams queue for one batching thread: it takes up to
+    ``batch_size`` of them, waiting at most ``max_wait`` seconds after the
+    first for the batch to fill, and runs them through the model in one
+    padded forward pass. Torch uses ``threads`` intra-op threads (default:
+    the physical core count), so one batch keeps every core busy instead of
+    many recognizers competing for them.
+    """
+    name = "transformers"
+
+    def __init__(self, model_path, batch_size=8, max_wait=0.05, threads=None, max_new_tokens=128,
+                 stream_options=None):
+        import torch
+        from transformers import AutoConfig, AutoProcessor, AutoModelForCTC, AutoModelForSpeechSeq2Seq
+        self.torch = torch
+        self.threads = configure_torch_threads(threads)
+        local = os.path.isdir(model_path)
+        config = AutoConfig.from_pretrained(model_path, local_files_only=local)
+        self.seq2seq = bool(config.is_encoder_decoder)
+        model_cls = AutoModelForSpeechSeq2Seq if self.seq2seq else AutoModelForCTC
+        self.processor = AutoProcessor.from_pretrained(model_path, local_files_only=local)
+        self.model = model_cls.from_pretrained(model_path, local_files_only=local).eval()
+        self.model_path = model_path
+        self.sample_rate = self.processor.feature_extractor.sampling_rate
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.max_new_tokens = max_new_tokens
+        self.stream_options = stream_options or {}
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.batch_worker, name="asr-batcher", daemon=True)
+        self.thread.start()
+
+        # Statistics
+        self.utterances = 0
+        self.batches = 0
+        self.audio_seconds = 0.0
+        self.busy_seconds = 0.0
+        self.max_batch = 0
+
+    def create_stream(self, samplerate):
+        return SegmentStream(self, samplerate, **self.stream_options)
+
+    def submit(self, samples, samplerate):
+        """Queue one utterance (int16 samples); returns a Future of its text"""
+        if samplerate != self.sample_rate:
+            samples = StreamingResampler(samplerate, self.sample_rate).process(samples).copy()
+        future = Future()
+        self.jobs.put((samples.astype(np.float32) / 32768.0, future))
+        return future
+
+    def transcribe(self, audio_batch):
+        """Recognize a list of float32 waveforms at the model rate in one pass"""
+        torch = self.torch
+        inputs = self.processor(audio_batch, sampling_rate=self.sample_rate, return_tensors="pt", padding=True)
+        with torch.inference_mode():
+            if self.seq2seq:
+                ids = self.model.generate(**inputs, max_new_tokens=self.max_new_tokens)
+            else:
+                ids = self.model(**inputs).logits.argmax(dim=-1)
+        return [text.strip().lower() for text in self.processor.batch_decode(ids, skip_special_tokens=True)]
+
+    def _next_batch(self):
+        """Block for the first job, then gather more until the batch is full or max_wait passes"""
+        job = self.jobs.get()
+        if job is None:
+            return None
+        batch = [job]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self.jobs.get(timeout=remaining) if remaining > 0 else self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                self.jobs.put(None)  # finish this batch, then stop
+                break
+            batch.append(job)
+        return batch
+
+    def batch_worker(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            audio = [samples for samples, _ in batch]
+            started = time.perf_counter()
+            try:
+                texts = self.transcribe(audio)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            with self.lock:
+                self.batches += 1
+                self.utterances += len(batch)
+                self.max_batch = max(self.max_batch, len(batch))
+                self.audio_seconds += sum(len(a) for a in audio) / float(self.sample_rate)
+                self.busy_seconds += time.perf_counter() - started
+            for (_, future), text in zip(batch, texts):
+                future.set_result(text)
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "engine": self.name,
+                "threads": self.threads,
+                "utterances": self.utterances,
+                "batches": self.batches,
+                "avg_batch": self.utterances / self.batches if self.batches else 0.0,
+                "max_batch": self.max_batch,
+                "audio_seconds": self.audio_seconds,
+                "busy_seconds": self.busy_seconds,
+                "rtf": self.busy_seconds / self.audio_seconds if self.audio_seconds else 0.0,
+            }
+
+    def close(self):
+        self.jobs.put(None)
+        self.thread.join(timeout=5)
+
+ENGINES = {
+    "vosk": VoskEngine,
+    "transformers": TransformersEngine,
+}
+
+def create_engine(name="vosk", **kwargs):
+    """Create a recognizer engine by name ('vosk' or 'transformers')"""
+    try:
+        engine_cls = ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown recognizer engine '{name}' (choose from {', '.join(ENGINES)})")
+    return engine_cls(**kwargs)
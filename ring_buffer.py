@@ -0,0 +1,114 @@
+import threading
+import time
+
+OVERFLOW_POLICIES = ("drop-oldest", "block")
+
+class CaptureRingBuffer:
+    """Preallocated ring of fixed-size audio blocks between capture and recognition.
+
+    The capture callback copies each block into the next free slot and the
+    recognizer copies it out into its own reusable buffer, so no per-block
+    objects are allocated and memory stays flat however long the session
+    runs. When the ring is full the overflow policy decides what happens:
+
+    - ``drop-oldest`` overwrites the oldest unread block, bounding lag.
+    - ``block`` waits up to ``block_timeout`` for the reader, then drops the
+      new block. This stalls the audio callback, so keep the timeout short.
+    """
+
+    def __init__(self, slots=64, block_bytes=8000, overflow="drop-oldest", block_timeout=0.05):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {', '.join(OVERFLOW_POLICIES)}")
+        self.slots = slots
+        self.block_bytes = block_bytes
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+
+        self.buffer = bytearray(slots * block_bytes)
+        self.view = memoryview(self.buffer)
+        self.lengths = [0] * slots
+        self.timestamps = [0.0] * slots
+        self.read_count = 0    # total blocks consumed (or dropped as oldest)
+        self.write_count = 0   # total blocks stored
+        self.cond = threading.Condition()
+
+        # Statistics
+        self.overruns = 0        # writes that found the ring full
+        self.dropped = 0         # blocks lost because of an overrun
+        self.block_waits = 0     # writes that had to wait for the reader
+        self.max_depth = 0
+
+    def depth(self):
+        """Number of blocks waiting to be read"""
+        return self.write_count - self.read_count
+
+    def write(self, data, timestamp=None):
+        """Copy one captured block into the ring.
+
+        Returns the number of blocks lost to an overrun: 0 normally, 1 if the
+        oldest block was overwritten or the new block could not be stored.
+        """
+        size = memoryview(data).nbytes
+        if size > self.block_bytes:
+            raise ValueError(f"block of {size} bytes exceeds slot size {self.block_bytes}")
+
+        lost = 0
+        with self.cond:
+            if self.write_count - self.read_count >= self.slots:
+                self.overruns += 1
+                if self.overflow == "drop-oldest":
+                    self.read_count += 1
+                    self.dropped += 1
+                    lost = 1
+                else:
+                    self.block_waits += 1
+                    deadline = time.monotonic() + self.block_timeout
+                    while self.write_count - self.read_count >= self.slots:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.dropped += 1
+                            return 1
+                        self.cond.wait(remaining)
+
+            slot = self.write_count % self.slots
+            start = slot * self.block_bytes
+            self.buffer[start:start + size] = data
+            self.lengths[slot] = size
+            self.timestamps[slot] = timestamp if timestamp is not None else time.time()
+            self.write_count += 1
+            self.max_depth = max(self.max_depth, self.write_count - self.read_count)
+            self.cond.notify_all()
+        return lost
+
+    def read_into(self, out, timeout=None):
+        """Copy the oldest block into ``out`` (a bytearray of at least block_bytes).
+
+        Returns ``(nbytes, timestamp)``, or ``(0, None)`` if nothing arrived
+        within ``timeout`` seconds.
+        """
+        with self.cond:
+            if self.write_count == self.read_count:
+                self.cond.wait(timeout)
+                if self.write_count == self.read_count:
+                    return 0, None
+
+            slot = self.read_count % self.slots
+            size = self.lengths[slot]
+            start = slot * self.block_bytes
+            out[:size] = self.view[start:start + size]
+            timestamp = self.timestamps[slot]
+            self.read_count += 1
+            self.cond.notify_all()
+        return size, timestamp
+
+    def get_stats(self):
+        """Return occupancy and overrun counters"""
+        with self.cond:
+            return {
+                "depth": self.write_count - self.read_count,
+                "max_depth": self.max_depth,
+                "slots": self.slots,
+                "overruns": self.overruns,
+                "dropped": self.dropped,
+                "block_waits": self.block_waits,
+            }
@@ -0,0 +1,147 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+def common_prefix(word_lists):
+    """Longest run of leading words shared by all lists"""
+    prefix = []
+    for words in zip(*word_lists):
+        if any(w != words[0] for w in words[1:]):
+            break
+        prefix.append(words[0])
+    return prefix
+
+class SpeculativeSynthesizer:
+    """Starts synthesis on the stable prefix of partial results before the final arrives.
+
+    A word is considered stable once it appears at the same position in the
+    last ``stable_partials`` partial results (the newest word of a partial
+    is never stable, it is often still being extended). Whenever at least
+    ``min_words`` new stable words have accumulated, that segment is sent
+    to ``synth_fn`` in the background. When the final result arrives,
+    speculative segments that match the start of the final text are kept
+    (their clips play first) and only the rest of the final text still has
+    to be synthesized; segments that do not match are discarded and
+    counted as wasted work.
+    """
+
+    def __init__(self, synth_fn, stable_partials=2, min_words=3, max_workers=2):
+        self.synth_fn = synth_fn
+        self.stable_partials = stable_partials
+        self.min_words = min_words
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts-speculative")
+        self.lock = threading.Lock()
+        self.history = []     # word lists of the most recent partials
+        self.segments = []    # (words, future) speculated for the current utterance
+        self.covered = 0      # stable words already handed to a segment
+
+        # Statistics
+        self.started = 0
+        self.used = 0
+        self.wasted = 0
+        self.wasted_seconds = 0.0
+        self.words_saved = 0
+
+    def _timed_synth(self, text):
+        started = time.perf_counter()
+        clip = self.synth_fn(text)
+        return clip, time.perf_counter() - started
+
+    def on_partial(self, text):
+        """Feed a partial result; may start synthesis of newly stable words.
+
+        An empty partial means the utterance ended without a final result
+        (or was abandoned), so its speculation is dropped.
+        """
+        words = text.split()
+        if not words:
+            self.reset()
+            return
+        with self.lock:
+            if self.history and words == self.history[-1]:
+                return
+            self.history = (self.history + [words])[-self.stable_partials:]
+            if len(self.history) < self.stable_partials:
+                return
+
+            stable = common_prefix(self.history)[:len(words) - 1]
+            if len(stable) < self.covered:
+                # Recognizer revised words we already speculated on; stop extending
+                return
+            if len(stable) - self.covered < self.min_words:
+                return
+
+            segment = stable[self.covered:]
+            self.covered = len(stable)
+            self.started += 1
+            future = self.executor.submit(self._timed_synth, " ".join(segment))
+            self.segments.append((segment, future))
+
+    def resolve(self, final_text):
+        """Match speculative segments against the final text and reset for the next utterance.
+
+        Returns ``(segments, remainder)``: ``(text, future)`` pairs of the
+        matching segments in order (each future resolves to ``(clip,
+        seconds)``) and the part of the final text that still needs to be
+        synthesized.
+        """
+        final_words = final_text.split()
+        segments = self._take_segments()
+
+        kept, position = [], 0
+        for i, (words, future) in enumerate(segments):
+            if final_words[position:position + len(words)] != words:
+                # Mismatch: this and every later segment are wasted
+                for _, stale in segments[i:]:
+                    self._discard(stale)
+                break
+            kept.append((" ".join(words), future))
+            position += len(words)
+
+        with self.lock:
+            self.used += len(kept)
+            self.words_saved += position
+        return kept, " ".join(final_words[position:])
+
+    def _take_segments(self):
+        with self.lock:
+            segments, self.segments = self.segments, []
+            self.history = []
+            self.covered = 0
+        return segments
+
+    def reset(self):
+        """Forget the current utterance, discarding its speculative segments"""
+        for _, future in self._take_segments():
+            self._discard(future)
+
+    def _discard(self, future):
+        with self.lock:
+            self.wasted += 1
+        if future.cancel():
+            return
+        # Already running or finished: account for the synthesis time it burned
+        future.add_done_callback(self._account_wasted)
+
+    def _account_wasted(self, future):
+        try:
+            _, seconds = future.result()
+        except Exception:
+            return
+        with self.lock:
+            self.wasted_seconds += seconds
+
+    def get_stats(self):
+        """Return speculation counters"""
+        with self.lock:
+            return {
+                "started": self.started,
+                "used": self.used,
+                "wasted": self.wasted,
+                "wasted_seconds": self.wasted_seconds,
+                "words_saved": self.words_saved,
+            }
+
+    def close(self):
+        """Stop the background synthesis threads"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,253 @@
+"""WebSocket server that transcribes many audio streams with one shared Vosk model.
+
+Each connection is a session: the client sends a JSON hello, then binary
+frames of 16-bit mono PCM, and receives JSON transcripts (and, if asked
+for, the synthesized speech of every final result as a binary frame):
+
+    python stream_server.py --model vosk-model-small-en-us --port 2800
+
+Client -> server:
+- text ``{"samplerate": 16000, "tts": true, "lang": "en"}`` (first message)
+- binary PCM blocks
+- text ``{"type": "eof"}`` to flush the last utterance
+
+Server -> client:
+- ``{"type": "ready", "session": id}``
+- ``{"type": "partial", "text": ...}`` or ``{"type": "final", "text": ..., "result": {...}}``
+  once per audio block
+- ``{"type": "audio", "format": "mp3", "text": ...}`` followed by a binary frame
+- ``{"type": "error", "message": ...}``
+
+The model is loaded once; every session gets its own KaldiRecognizer and
+its blocks are recognized one at a time on a shared thread pool, so a
+recognizer is never used from two threads at once while the pool spreads
+sessions across cores (Vosk releases the GIL while decoding). With
+``--engine transformers`` sessions instead share one batching
+recognizers.TransformersEngine, whose utterances from all sessions are
+recognized together in batches. Each
+session buffers at most ``max_pending`` blocks; when it is full the server
+stops reading that socket, which pushes back on that client only.
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import metrics
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 2800
+
+# Close code sent when the session limit is reached (RFC 6455 "try again later")
+CLOSE_TRY_AGAIN = 1013
+
+class StreamServer:
+    """Shares one model across concurrent WebSocket transcription sessions"""
+
+    def __init__(self, model, max_sessions=16, workers=None, max_pending=8, tts_engine=None, tts_workers=2,
+                 engine=None):
+        if engine is None:
+            from recognizers import VoskEngine
+            engine = VoskEngine(model=model)
+        self.engine = engine
+        self.model = model
+        self.max_sessions = max_sessions
+        self.max_pending = max_pending
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="recognizer")
+        self.tts_engine = tts_engine
+        self.tts_executor = ThreadPoolExecutor(max_workers=tts_workers, thread_name_prefix="stream-tts")
+        self.session_ids = itertools.count(1)
+        self.server = None
+        self.lock = threading.Lock()
+
+        # Statistics
+        self.sessions_active = 0
+        self.sessions_served = 0
+        self.sessions_rejected = 0
+        self.blocks = 0
+        self.audio_seconds = 0.0
+        self.recognizer_seconds = 0.0
+        self.backpressure_waits = 0
+
+        metrics.register_gauge("stream_sessions_active", lambda: self.sessions_active)
+
+    def _accept(self, rec, data, samplerate):
+        """Recognize one block on a pool thread; returns the JSON reply"""
+        started = time.perf_counter()
+        if rec.AcceptWaveform(data):
+            res = json.loads(rec.Result())
+            reply = {"type": "final", "text": res.get("text", ""), "result": res}
+        else:
+            reply = {"type": "partial", "text": json.loads(rec.PartialResult()).get("partial", "")}
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.blocks += 1
+            self.audio_seconds += len(data) / 2.0 / samplerate
+            self.recognizer_seconds += elapsed
+        return reply
+
+    def _flush(self, rec):
+        res = json.loads(rec.FinalResult())
+        return {"type": "final", "text": res.get("text", ""), "result": res}
+
+    async def _send_audio(self, websocket, text, lang, previous, send_lock):
+        """Synthesize a final result and send it after the previous clip of the session"""
+        loop = asyncio.get_running_loop()
+        try:
+            audio = await loop.run_in_executor(self.tts_executor, self.tts_engine.synthesize, text, lang)
+        except Exception as e:
+            audio = None
+            error = str(e)
+        if previous:
+            await previous
+        async with send_lock:
+            # Header and clip go out back to back so clients can pair them
+            if audio is None:
+                await websocket.send(json.dumps({"type": "error", "message": f"TTS failed: {error}"}))
+                return
+            await websocket.send(json.dumps({"type": "audio", "format": self.tts_engine.extension, "text": text}))
+            await websocket.send(audio)
+
+    async def _recognize(self, websocket, rec, blocks, samplerate, tts, lang):
+        """Drain one session's block queue in order, replying after each block"""
+        loop = asyncio.get_running_loop()
+        send_lock = asyncio.Lock()
+        last_tts = None
+        while True:
+            data = await blocks.get()
+            if data is None:
+                reply = await loop.run_in_executor(self.executor, self._flush, rec)
+            else:
+                reply = await loop.run_in_executor(self.executor, self._accept, rec, data, samplerate)
+            async with send_lock:
+                await websocket.send(json.dumps(reply))
+            if reply["type"] == "final" and reply["text"]:
+                metrics.incr("stream_finals")
+                if tts:
+                    # Synthesis runs alongside recognition of the next blocks; clips keep their order
+                    last_tts = asyncio.ensure_future(
+                        self._send_audio(websocket, reply["text"], lang, last_tts, send_lock))
+            if data is None:
+                break
+        if last_tts:
+            await last_tts
+
+    async def handle(self, websocket):
+        with self.lock:
+            if self.sessions_active >= self.max_sessions:
+                self.sessions_rejected += 1
+                full = True
+            else:
+                self.sessions_active += 1
+                self.sessions_served += 1
+                full = False
+        if full:
+            metrics.incr("stream_sessions_rejected")
+            await websocket.close(CLOSE_TRY_AGAIN, "session limit reached")
+            return
+
+        session_id = next(self.session_ids)
+        worker = None
+        try:
+            hello = json.loads(await websocket.recv())
+            samplerate = int(hello.get("samplerate", 16000))
+            tts = bool(hello.get("tts")) and self.tts_engine is not None
+            lang = hello.get("lang", "en")
+
+            loop = asyncio.get_running_loop()
+            rec = await loop.run_in_executor(self.executor, self.engine.create_stream, samplerate)
+            await websocket.send(json.dumps({"type": "ready", "session": session_id}))
+
+            blocks = asyncio.Queue(maxsize=self.max_pending)
+            worker = asyncio.ensure_future(self._recognize(websocket, rec, blocks, samplerate, tts, lang))
+            async for message in websocket:
+                if isinstance(message, str):
+                    if json.loads(message).get("type") == "eof":
+                        break
+                    continue
+                if blocks.full():
+                    # Not reading the socket until there is room pushes back on this client
+                    with self.lock:
+                        self.backpressure_waits += 1
+                await blocks.put(message)
+            await blocks.put(None)
+            await worker
+        except Exception as e:
+            if worker:
+                worker.cancel()
+            try:
+                await websocket.send(json.dumps({"type": "error", "message": str(e)}))
+            except Exception:
+                pass
+        finally:
+            with self.lock:
+                self.sessions_active -= 1
+
+    def get_stats(self):
+        """Session counts, recognizer load and backpressure"""
+        with self.lock:
+            return {
+                "sessions_active": self.sessions_active,
+                "sessions_served": self.sessions_served,
+                "sessions_rejected": self.sessions_rejected,
+                "blocks": self.blocks,
+                "audio_seconds": self.audio_seconds,
+                "recognizer_seconds": self.recognizer_seconds,
+                "backpressure_waits": self.backpressure_waits,
+            }
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+        """Run until cancelled; ``ready`` (an Event) is set once listening"""
+        from websockets.asyncio.server import serve
+
+        async with serve(self.handle, host, port, max_size=2 ** 22) as server:
+            self.server = server
+            print(f"Stream server listening on ws://{host}:{port} "
+                  f"(max {self.max_sessions} sessions, {self.workers} recognizer threads)")
+            if ready:
+                ready.set()
+            await asyncio.Future()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.tts_executor.shutdown(wait=False, cancel_futures=True)
+        if self.tts_engine:
+            self.tts_engine.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe many WebSocket audio streams with one shared model")
+    parser.add_argument("--model", default="vosk-model-small-en-us", help="Path to Vosk model folder")
+    parser.add_argument("--engine", choices=["vosk", "transformers"], default="vosk",
+                        help="Recognizer backend (--model is then a transformers model folder)")
+    parser.add_argument("--batch-size", type=int, default=8, help="Utterances per forward pass (transformers)")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--max-sessions", type=int, default=16, help="Concurrent sessions before new ones are refused")
+    parser.add_argument("--workers", type=int, default=None, help="Recognizer threads (default: CPU count)")
+    parser.add_argument("--max-pending", type=int, default=8, help="Audio blocks buffered per session")
+    parser.add_argument("--tts", default=None, help="TTS engine for audio replies (gtts, offline, stub)")
+    args = parser.parse_args()
+
+    from tts_engines import create_engine
+    import recognizers
+
+    engine = recognizers.create_engine(args.engine, model_path=args.model,
+                                       **({"batch_size": args.batch_size} if args.engine == "transformers" else {}))
+    server = StreamServer(getattr(engine, "model", None), max_sessions=args.max_sessions, workers=args.workers,
+                          max_pending=args.max_pending, tts_engine=create_engine(args.tts) if args.tts else None,
+                          engine=engine)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nStopping stream server...")
+    finally:
+        stats = server.get_stats()
+        print(f"Served {stats['sessions_served']} sessions ({stats['sessions_rejected']} rejected), "
+              f"{stats['audio_seconds']:.1f}s audio, {stats['backpressure_waits']} backpressure waits")
+        server.close()
+        engine.close()
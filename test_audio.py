@@ -1,3 +1,5 @@
+import time
+import numpy as np
 import sounddevice as sd
 
 def test_audio_devices():
@@ -6,5 +8,24 @@ def test_audio_devices():
     for i, device in enumerate(devices):
         print(f"{i}: {device['name']} (in:{device['max_input_channels']} out:{device['max_output_channels']})")
 
+def test_pcm_playback(sample_rate=22050, seconds=0.5):
+    """Play a raw 16-bit PCM tone through the audio player"""
+    from audio_player import AudioPlayer
+    t = np.arange(int(sample_rate * seconds)) / float(sample_rate)
+    pcm = (np.sin(2 * np.pi * 440.0 * t) * 8000).astype(np.int16).tobytes()
+    player = AudioPlayer()
+    player.start_playback_thread()
+    try:
+        player.queue_audio(pcm, fmt="pcm", sample_rate=sample_rate)
+        deadline = time.time() + seconds + 3
+        while player.is_busy() and time.time() < deadline:
+            time.sleep(0.05)
+        stats = player.get_lag_stats()
+        assert stats["count"] == 1, "PCM clip was not played"
+        print(f"\nPlayed {seconds}s of raw PCM at {sample_rate} Hz")
+    finally:
+        player.stop_playback_thread()
+
 if __name__ == "__main__":
-    test_audio_devices()
\ No newline at end of file
+    test_audio_devices()
+    test_pcm_playback()
\ No newline at end of file
@@ -1,27 +1,131 @@
-import gtts
 import os
+import re
+import time
 import threading
-from audio_player import AudioPlayer
+from collections import deque
+from audio_player import AudioPlayer, AudioClip
 from file_manager import FileManager
+from tts_cache import TTSCache
+from tts_engines import TTSEngine, create_engine
+from tts_pool import TTSWorkerPool
+from metrics import metrics
+from speculative import SpeculativeSynthesizer
+from phrase_store import PhraseStore
+from coalescer import UtteranceCoalescer
 
 # Global instances
 audio_player = None
 file_manager = None
+tts_cache = None
+tts_engine = None
+tts_pool = None
+speculator = None
+phrase_store = None
+coalescer = None
+streaming_enabled = False
+archive_clips = False  # Write every synthesized clip to audio_clips/ as well
 
-def initialize(device_id=None, retention_minutes=1):
-    """Initialize the audio player and file manager"""
-    global audio_player, file_manager
+# Streaming synthesis: keep the first chunk short so audio starts quickly
+FIRST_CHUNK_WORDS = 6
+MAX_CHUNK_WORDS = 20
+MIN_CHUNK_WORDS = 4  # shorter pieces are merged; each chunk costs a TTS round trip and a clip gap
+CLAUSE_WORDS = {"and", "but", "or", "so", "because", "then", "which", "that", "when", "while", "if"}
+
+# Time-to-first-audio samples (seconds) per synthesis mode
+ttfa_stats = {mode: deque(maxlen=1000) for mode in ("full", "streaming", "speculative", "prewarmed")}
+stats_lock = threading.Lock()
+
+def initialize(device_id=None, retention_minutes=1, use_cache=True, cache_max_bytes=50 * 1024 * 1024,
+               engine="gtts", streaming=False, archive=False, tts_workers=2, max_pending=8,
+               overflow="block", player=None, speculative=False,
+               clip_disk_cap=None, prewarm_phrases=None, prewarm_budget=16 * 1024 * 1024, prewarm_workers=4,
+               coalesce_window=None, coalesce_max_hold=1.5, max_lag=None, preempt=True, catch_up_threshold=None):
+    """Initialize the audio player, file manager, TTS engine and TTS cache.
+
+    ``engine`` is either a TTSEngine instance or an engine name understood by
+    ``tts_engines.create_engine`` ('gtts', 'offline' or 'stub'). With
+    ``streaming`` long utterances are synthesized and played chunk by chunk.
+    Clips are played from memory; ``archive`` also keeps a copy on disk.
+    With ``tts_workers`` > 0, ``speak`` hands utterances to a pool of that
+    many workers holding at most ``max_pending`` utterances. ``player``
+    replaces the pygame AudioPlayer with any object offering the same
+    queue_audio/start_playback_thread/stop_playback_thread methods. With
+    ``speculative``, partial results passed to ``on_partial`` start
+    synthesis of their stable prefix before the final result arrives.
+    ``clip_disk_cap`` (bytes) limits how much archived audio is kept.
+    ``prewarm_phrases`` are synthesized in parallel and kept decoded in
+    memory (up to ``prewarm_budget`` bytes) so they play without delay.
+    With ``coalesce_window`` (seconds), finals arriving within that window
+    of each other, or while earlier speech is still being synthesized or
+    played, are merged into one TTS request held at most
+    ``coalesce_max_hold`` seconds. ``max_lag``, ``preempt`` and
+    ``catch_up_threshold`` bound how far playback may fall behind the
+    speaker (see AudioPlayer.configure_lag).
+    """
+    global audio_player, file_manager, tts_cache, tts_engine, tts_pool, speculator, phrase_store, coalescer
+    global streaming_enabled, archive_clips
+
+    streaming_enabled = streaming
+    archive_clips = archive
+
+    # Initialize the TTS engine first so a missing offline backend fails fast
+    tts_engine = engine if isinstance(engine, TTSEngine) else create_engine(engine)
     
-    # Initialize audio player
-    audio_player = AudioPlayer()
-    if device_id is not None:
-        audio_player.set_output_device(device_id)
+    # Initialize audio player (reusing the one list_audio_devices created, if any)
+    if player:
+        audio_player = player
+    elif audio_player:
+        if device_id is not None:
+            audio_player.set_output_device(device_id)
+    else:
+        audio_player = AudioPlayer(device_id=device_id)
+    if max_lag is not None or catch_up_threshold is not None:
+        if hasattr(audio_player, "configure_lag"):
+            audio_player.configure_lag(max_lag=max_lag, preempt=preempt, catch_up_threshold=catch_up_threshold)
+        else:
+            print("This player does not support max lag or catch-up; ignoring them")
     audio_player.start_playback_thread()
     
     # Initialize file manager
-    file_manager = FileManager(retention_minutes=retention_minutes)
+    file_manager = FileManager(retention_minutes=retention_minutes, max_bytes=clip_disk_cap)
     file_manager.start_cleanup_thread()
 
+    # Initialize the TTS cache and keep the retention sweep away from it
+    if use_cache:
+        tts_cache = TTSCache(max_bytes=cache_max_bytes)
+        file_manager.protect_directory(tts_cache.cache_dir)
+
+    # Synthesize off the recognition thread, delivering clips in utterance order
+    if tts_workers:
+        tts_pool = TTSWorkerPool(_pool_synthesize, _pool_deliver, num_workers=tts_workers,
+                                 max_pending=max_pending, overflow=overflow)
+        tts_pool.start()
+        metrics.register_gauge("tts_pool_depth", tts_pool.get_depth)
+        metrics.register_gauge("tts_backpressure_waits", lambda: tts_pool.get_stats()["backpressure_waits"])
+
+    # Synthesize and decode the known frequent phrases up front
+    if prewarm_phrases:
+        phrase_store = PhraseStore(max_bytes=prewarm_budget)
+        stats = phrase_store.prewarm(prewarm_phrases, synthesize_clip, workers=prewarm_workers)
+        print(f"Prewarmed {stats['phrases']} phrases in {stats['prewarm_seconds']:.2f}s using "
+              f"{stats['bytes'] / 1024 / 1024:.1f} MB of {stats['max_bytes'] / 1024 / 1024:.1f} MB"
+              + (f" ({stats['skipped']} over budget)" if stats["skipped"] else "")
+              + (f" ({stats['failed']} failed)" if stats["failed"] else ""))
+        metrics.set_gauge("prewarm_seconds", stats["prewarm_seconds"])
+        metrics.set_gauge("prewarm_bytes", stats["bytes"])
+
+    # Speculative synthesis on stable partial results
+    if speculative:
+        speculator = SpeculativeSynthesizer(synthesize_clip)
+        metrics.register_gauge("speculative_wasted", lambda: speculator.get_stats()["wasted"])
+
+    # Merge short finals that arrive close together into one TTS request
+    if coalesce_window is not None:
+        coalescer = UtteranceCoalescer(_submit, window=coalesce_window, max_hold=coalesce_max_hold,
+                                       busy_fn=pipeline_busy)
+        coalescer.start()
+        metrics.register_gauge("tts_requests_saved", lambda: coalescer.get_stats()["saved"])
+
 def list_audio_devices():
     """List available audio output devices"""
     global audio_player
@@ -33,30 +137,266 @@ def list_audio_devices():
     print(f"Found {len(devices) if devices else 0} output devices")  # Debug line
     return devices
 
-def text_to_speech(text, lang='en', output_file='audio_clips/output.mp3'):
-    """Convert text to speech, save as an mp3 file, and queue for playback."""
-    global audio_player, file_manager
-    
-    # Ensure the audio_clips directory exists
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    
+def get_engine():
+    """Return the active TTS engine, creating the default one if needed"""
+    global tts_engine
+    if tts_engine is None:
+        tts_engine = create_engine("gtts")
+    return tts_engine
+
+def synthesize_clip(text, lang='en', output_file='audio_clips/output.mp3'):
+    """Synthesize text into a playable clip without queueing it.
+
+    Returns an in-memory AudioClip, read from the TTS cache on a hit or
+    freshly synthesized otherwise. Audio only reaches the disk when it is stored in the cache or
+    when clip archiving is enabled (then it is written to ``output_file``).
+    """
+    engine = get_engine()
+
+    # Keep the file extension in line with what the engine produces
+    output_file = f"{os.path.splitext(output_file)[0]}.{engine.extension}"
+
+    cache_key = None
+    if tts_cache:
+        cache_key = tts_cache.make_key(text, lang=lang, settings=engine.settings())
+        cached = tts_cache.get(cache_key)
+        if cached:
+            print(f"TTS cache hit for '{text}'")
+            metrics.incr("tts_cache_hits")
+            return AudioClip(cached[0], fmt=cached[1], label=text)
+        metrics.incr("tts_cache_misses")
+
     # Generate the speech
-    tts = gtts.gTTS(text, lang=lang)
-    tts.save(output_file)
-    print(f"Saved TTS output to {output_file}")
-    
-    # Mark the file as active (with 5 minute duration) and queue it for playback
-    if file_manager:
-        file_manager.mark_file_active(output_file, duration_minutes=1)
-    
+    audio = engine.synthesize(text, lang=lang)
+
+    if cache_key:
+        tts_cache.store(cache_key, audio, extension=engine.extension)
+
+    if archive_clips:
+        _write_clip(audio, output_file)
+        print(f"Archived TTS output to {output_file}")
+        if file_manager:
+            # Mark the file as active (with 1 minute duration)
+            file_manager.mark_file_active(output_file, duration_minutes=1)
+
+    return AudioClip(audio, fmt=engine.extension, label=text)
+
+def _write_clip(audio, path):
+    """Write encoded audio bytes to disk"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as fh:
+        fh.write(audio)
+
+def split_into_chunks(text, first_chunk_words=FIRST_CHUNK_WORDS, max_chunk_words=MAX_CHUNK_WORDS,
+                      min_chunk_words=MIN_CHUNK_WORDS):
+    """Split text into sentence/clause sized chunks for streaming synthesis.
+
+    Punctuation is used when present, but Vosk output usually has none, so
+    long runs are also broken at word boundaries, preferring to break before
+    a conjunction. The first chunk is kept short so playback starts early.
+    Pieces shorter than ``min_chunk_words`` (after a comma, or a short tail)
+    are merged with their neighbours instead of becoming their own request.
+    """
+    pieces = []
+    for piece in re.split(r'(?<=[.!?;:,])\s+', text.strip()):
+        if pieces and len(pieces[-1].split()) < min_chunk_words:
+            pieces[-1] += " " + piece
+        else:
+            pieces.append(piece)
+    if len(pieces) > 1 and len(pieces[-1].split()) < min_chunk_words:
+        tail = pieces.pop()
+        pieces[-1] += " " + tail
+
+    chunks = []
+    for piece in pieces:
+        words = piece.split()
+        while words:
+            limit = first_chunk_words if not chunks else max_chunk_words
+            # Let a chunk run slightly long rather than leave a tiny remainder
+            if len(words) < limit + min_chunk_words:
+                chunks.append(" ".join(words))
+                break
+
+            # Break before the last clause word within the limit, if any
+            cut = limit
+            for i in range(limit, max(limit // 2, min_chunk_words, 1) - 1, -1):
+                if words[i].lower() in CLAUSE_WORDS:
+                    cut = i
+                    break
+            chunks.append(" ".join(words[:cut]))
+            words = words[cut:]
+    return chunks
+
+def record_time_to_first_audio(mode, seconds, chunks=1):
+    """Record and report how long an utterance took to reach the player"""
+    with stats_lock:
+        ttfa_stats[mode].append(seconds)
+    print(f"Time to first audio ({mode}, {chunks} chunk{'s' if chunks != 1 else ''}): {seconds:.3f}s")
+
+def get_ttfa_stats():
+    """Return average/max time-to-first-audio per synthesis mode"""
+    with stats_lock:
+        return {
+            mode: {
+                "count": len(samples),
+                "avg": sum(samples) / len(samples) if samples else 0.0,
+                "max": max(samples) if samples else 0.0,
+            }
+            for mode, samples in ttfa_stats.items()
+        }
+
+def text_to_speech(text, lang='en', output_file='audio_clips/output.mp3', stream=None, emit=None, trace=None,
+                   prefetched=None):
+    """Convert text to speech and queue it for playback.
+
+    With ``stream`` (defaults to the mode chosen in ``initialize``) the text is
+    split into chunks that are synthesized and queued one after another, so
+    the first chunk plays while later ones are still being synthesized.
+    Clips go to ``emit`` if given, otherwise straight to the audio player.
+    ``trace`` (a metrics.Trace) travels with every clip so the player can
+    record playback timings. ``prefetched`` is a list of ``(text, future)``
+    pairs for clips synthesized speculatively from partial results (a
+    segment whose synthesis failed is synthesized again here); they are queued before
+    ``text``, which is then only the part not already covered. Returns the
+    list of AudioClips that were queued.
+    """
+    started = time.perf_counter()
+    if emit is None and audio_player:
+        emit = audio_player.queue_audio
+
+    if stream is None:
+        stream = streaming_enabled
+    prefetched = prefetched or []
+    prewarmed = phrase_store.get(text) if phrase_store and not prefetched else None
+    if prewarmed is not None or not text.strip():
+        chunks = []
+    else:
+        chunks = split_into_chunks(text) if stream else [text]
+    base, ext = os.path.splitext(output_file)
+
+    if trace:
+        trace.mark("tts_start")
+        trace.clips_pending = len(prefetched) + len(chunks) + (prewarmed is not None)
+
+    clips = []
+    if prewarmed is not None:
+        # Known phrase: already synthesized and decoded at startup
+        metrics.incr("prewarmed_hits")
+        if emit:
+            emit(prewarmed, trace=trace)
+        record_time_to_first_audio("prewarmed", time.perf_counter() - started)
+        clips.append(prewarmed)
+
+    for i, (segment, future) in enumerate(prefetched):
+        try:
+            clip, _ = future.result()
+        except Exception as e:
+            print(f"Speculative synthesis of '{segment}' failed ({e}); synthesizing it again")
+            clip = synthesize_clip(segment, lang=lang, output_file=f"{base}_spec{i}{ext}")
+        if emit:
+            emit(clip, trace=trace)
+        if i == 0:
+            record_time_to_first_audio("speculative", time.perf_counter() - started,
+                                       chunks=len(prefetched) + len(chunks))
+        clips.append(clip)
+
+    for i, chunk in enumerate(chunks):
+        chunk_file = output_file if len(chunks) == 1 else f"{base}_part{i}{ext}"
+        clip = synthesize_clip(chunk, lang=lang, output_file=chunk_file)
+        if emit:
+            emit(clip, trace=trace)
+        if i == 0 and not prefetched:
+            record_time_to_first_audio("streaming" if stream else "full",
+                                       time.perf_counter() - started, chunks=len(chunks))
+        clips.append(clip)
+
+    if trace:
+        trace.mark("tts_end")
+    return clips
+
+def pipeline_busy():
+    """True while earlier speech is still being synthesized or played"""
+    if tts_pool and tts_pool.get_depth():
+        return True
+    is_busy = getattr(audio_player, "is_busy", None)
+    return bool(is_busy and is_busy())
+
+def speak(text, lang='en', output_file='audio_clips/output.mp3', trace=None):
+    """Hand an utterance to the TTS worker pool, or synthesize inline without one.
+
+    With the pool this returns immediately (unless the pool is full and
+    applies backpressure), so the caller's recognition loop keeps running.
+    With coalescing enabled the text is held briefly to be merged with the
+    finals that follow it, unless it is a prewarmed phrase. Returns nothing
+    on every path; clips reach the audio player, not the caller.
+    """
+    prefetched = None
+    if speculator:
+        prefetched, text = speculator.resolve(text)
+    if coalescer:
+        if not prefetched and not (phrase_store and phrase_store.has(text)):
+            coalescer.add(text, lang=lang, output_file=output_file, trace=trace)
+            return
+        # Speculative clips are already on their way, or the phrase is prewarmed and
+        # plays as is; send held text ahead of it
+        coalescer.flush()
+    _submit(text, lang=lang, output_file=output_file, trace=trace, prefetched=prefetched)
+
+def _submit(text, lang='en', output_file='audio_clips/output.mp3', trace=None, prefetched=None):
+    if tts_pool:
+        tts_pool.submit(text, lang=lang, output_file=output_file, trace=trace, prefetched=prefetched)
+    else:
+        text_to_speech(text, lang=lang, output_file=output_file, trace=trace, prefetched=prefetched)
+
+def on_partial(text):
+    """Feed a partial recognition result to the speculative synthesizer ('' ends the utterance)"""
+    if speculator:
+        speculator.on_partial(text)
+
+def _pool_synthesize(text, emit, **kwargs):
+    text_to_speech(text, emit=emit, **kwargs)
+
+def _pool_deliver(clip, trace=None):
     if audio_player:
-        audio_player.queue_audio(output_file)
+        audio_player.queue_audio(clip, trace=trace)
 
 def cleanup():
     """Clean up resources"""
-    global audio_player, file_manager
+    global tts_engine, tts_pool, speculator, phrase_store, coalescer
     
     print("Starting cleanup...")
+
+    # Send any held text on before the workers stop
+    if coalescer:
+        coalescer.close()
+        stats = coalescer.get_stats()
+        print(f"Coalescing: {stats['finals']} finals sent as {stats['requests']} TTS requests "
+              f"({stats['saved']} saved, {stats['busy_holds']} held while busy, {stats['capped']} hit the hold cap), "
+              f"avg hold {stats['avg_hold'] * 1000:.0f} ms, max {stats['max_hold'] * 1000:.0f} ms")
+        coalescer = None
+
+    if phrase_store:
+        stats = phrase_store.get_stats()
+        print(f"Prewarmed phrases: {stats['hits']} hits, {stats['misses']} misses")
+        phrase_store = None
+
+    if speculator:
+        stats = speculator.get_stats()
+        print(f"Speculative TTS: {stats['started']} segments started, {stats['used']} used, "
+              f"{stats['wasted']} wasted ({stats['wasted_seconds']:.2f}s of synthesis), "
+              f"{stats['words_saved']} words ready before the final result")
+        speculator.close()
+        speculator = None
+
+    # Stop TTS workers before the player they feed
+    if tts_pool:
+        print("Stopping TTS workers...")
+        tts_pool.stop()
+        stats = tts_pool.get_stats()
+        print(f"TTS pool: {stats['completed']} completed, {stats['failed']} failed, "
+              f"{stats['dropped']} dropped, max depth {stats['max_depth']}, "
+              f"{stats['backpressure_waits']} backpressure waits ({stats['backpressure_time']:.2f}s)")
+        tts_pool = None
     
     # Stop audio player
     if audio_player:
@@ -67,5 +407,20 @@ def cleanup():
     if file_manager:
         print("Stopping file manager...")
         file_manager.stop_cleanup_thread()
+
+    # Close pooled HTTP sessions / local servers held by the engine
+    if tts_engine:
+        tts_engine.close()
+        tts_engine = None
+
+    if tts_cache:
+        stats = tts_cache.get_stats()
+        print(f"TTS cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate), {stats['entries']} entries, {stats['bytes']} bytes")
+
+    for mode, stats in get_ttfa_stats().items():
+        if stats["count"]:
+            print(f"Time to first audio ({mode}): avg {stats['avg']:.3f}s, "
+                  f"max {stats['max']:.3f}s over {stats['count']} utterances")
         
     print("Cleanup completed")
\ No newline at end of file
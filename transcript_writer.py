@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import queue
+import bisect
+import threading
+from datetime import datetime
+
+class AudioClock:
+    """Maps recognizer time offsets back to wall-clock capture time.
+
+    Recognizer word times count seconds of audio *fed* to it, which runs
+    behind the wall clock whenever the voice activity gate skips silence or
+    the capture ring drops blocks. ``fed(seconds, captured_at)`` is called
+    for every chunk handed to the recognizer with the epoch time its first
+    sample was captured; a new anchor is recorded whenever that time
+    disagrees with the fed-audio clock by more than ``tolerance`` seconds.
+    """
+
+    def __init__(self, tolerance=0.1):
+        self.tolerance = tolerance
+        self.offsets = []   # fed-audio seconds at each anchor
+        self.walls = []     # capture time (epoch) at each anchor
+        self.position = 0.0
+
+    def fed(self, seconds, captured_at):
+        """Record a chunk of ``seconds`` of audio captured starting at ``captured_at``"""
+        if not self.offsets or abs(self.to_wall(self.position) - captured_at) > self.tolerance:
+            self.offsets.append(self.position)
+            self.walls.append(captured_at)
+        self.position += seconds
+
+    def to_wall(self, offset):
+        """Epoch capture time of a recognizer offset"""
+        i = max(bisect.bisect_right(self.offsets, offset) - 1, 0)
+        return self.walls[i] + (offset - self.offsets[i])
+
+class TranscriptWriter:
+    """Background transcript sink that batches writes off the recognition thread.
+
+    ``write`` only enqueues the final result. A writer thread formats it as a
+    plain-text line (``[YYYY-mm-dd HH:MM:SS] text``, the format
+    transcripts.txt always had) and as a JSONL record with the word timings
+    and confidences, and writes them in batches: a batch is flushed once it
+    holds ``flush_bytes`` or its oldest record is ``flush_interval`` seconds
+    old. Files are rotated when they would grow past ``rotate_bytes`` or when
+    the date changes (``rotate_daily``); the old file is renamed with a
+    timestamp suffix and a fresh one is started.
+    """
+
+    def __init__(self, directory="transcripts", basename="transcripts", text=True, jsonl=True,
+                 flush_interval=1.0, flush_bytes=64 * 1024, rotate_bytes=None, rotate_daily=False,
+                 max_queue=1000):
+        self.directory = directory
+        self.paths = {}
+        if text:
+            self.paths["text"] = os.path.join(directory, basename + ".txt")
+        if jsonl:
+            self.paths["jsonl"] = os.path.join(directory, basename + ".jsonl")
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.rotate_bytes = rotate_bytes
+        self.rotate_daily = rotate_daily
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.files = {}
+        self.sizes = {}
+        self.opened_on = None
+        self.thread = None
+
+        # Statistics
+        self.records = 0
+        self.batches = 0
+        self.bytes_written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.write_errors = 0
+
+    def open(self):
+        """Open the output files (raising PermissionError/OSError) and start the writer thread"""
+        os.makedirs(self.directory, exist_ok=True)
+        for kind, path in self.paths.items():
+            self.files[kind] = open(path, "ab")
+            self.sizes[kind] = self.files[kind].tell()
+        self.opened_on = datetime.now().date()
+        self.thread = threading.Thread(target=self.worker, daemon=True)
+        self.thread.start()
+        return self
+
+    def write(self, result, timestamp=None, trace_id=None, clock=None):
+        """Queue a parsed Vosk final result; never blocks the caller.
+
+        Word start/end times are the recognizer's offsets into the audio it
+        was fed. With an AudioClock each word also gets ``wall_start`` and
+        ``wall_end``, the epoch times its audio was captured.
+        """
+        words = result.get("result") or []
+        if clock and clock.offsets:
+            words = [dict(word, wall_start=round(clock.to_wall(word["start"]), 3),
+                          wall_end=round(clock.to_wall(word["end"]), 3)) for word in words]
+        record = {"time": timestamp if timestamp is not None else time.time(), "trace_id": trace_id,
+                  "text": result.get("text", ""), "words": words}
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def format(self, record):
+        """Render one record for each output file"""
+        ts = datetime.fromtimestamp(record["time"])
+        lines = {}
+        if "text" in self.paths:
+            lines["text"] = f"[{ts.strftime('%Y-%m-%d %H:%M:%S')}] {record['text']}\n"
+        if "jsonl" in self.paths:
+            entry = dict(record, time=ts.isoformat(timespec="milliseconds"))
+            if record["words"]:
+                entry["start"] = record["words"][0].get("start")
+                entry["end"] = record["words"][-1].get("end")
+            lines["jsonl"] = json.dumps(entry) + "\n"
+        return lines
+
+    def rotate(self):
+        """Rename the current files with a timestamp suffix and start new ones"""
+        suffix = datetime.now().strftime("%Y%m%d-%H%M%S")
+        for kind, path in self.paths.items():
+            self.files[kind].close()
+            base, ext = os.path.splitext(path)
+            target, n = f"{base}.{suffix}{ext}", 1
+            while os.path.exists(target):
+                n += 1
+                target = f"{base}.{suffix}-{n}{ext}"
+            try:
+                os.replace(path, target)
+            except OSError as e:
+                print(f"Error rotating transcript file '{path}': {e}")
+            self.files[kind] = open(path, "ab")
+            self.sizes[kind] = 0
+        self.opened_on = datetime.now().date()
+        self.rotations += 1
+
+    def _write_batch(self, batch):
+        try:
+            pending = {kind: "".join(chunks).encode("utf-8") for kind, chunks in batch.items()}
+            needs_rotation = self.rotate_daily and datetime.now().date() != self.opened_on
+            if self.rotate_bytes and any(self.sizes[kind] and self.sizes[kind] + len(data) > self.rotate_bytes
+                                         for kind, data in pending.items()):
+                needs_rotation = True
+            if needs_rotation:
+                self.rotate()
+            for kind, data in pending.items():
+                self.files[kind].write(data)
+                self.files[kind].flush()
+                self.sizes[kind] += len(data)
+                self.bytes_written += len(data)
+            self.batches += 1
+        except (IOError, ValueError) as e:
+            self.write_errors += 1
+            print(f"Error writing transcripts: {e}")
+
+    def worker(self):
+        """Collect records into batches and write them by size or age"""
+        batch = {kind: [] for kind in self.paths}
+        batch_bytes = 0
+        batch_started = None
+        done = False
+        while not done:
+            timeout = None
+            if batch_started is not None:
+                timeout = max(0.0, batch_started + self.flush_interval - time.monotonic())
+            try:
+                record = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                record = False  # flush interval elapsed
+
+            if record is None:
+                done = True
+            elif record:
+                for kind, line in self.format(record).items():
+                    batch[kind].append(line)
+                    batch_bytes += len(line)
+                self.records += 1
+                if batch_started is None:
+                    batch_started = time.monotonic()
+
+            if batch_started is not None and (done or record is False or batch_bytes >= self.flush_bytes):
+                self._write_batch(batch)
+                batch = {kind: [] for kind in self.paths}
+                batch_bytes = 0
+                batch_started = None
+
+    def get_stats(self):
+        """Return write and batching counters"""
+        return {
+            "records": self.records,
+            "batches": self.batches,
+            "bytes_written": self.bytes_written,
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+            "write_errors": self.write_errors,
+        }
+
+    def close(self):
+        """Write out everything queued and close the files"""
+        if self.dropped:
+            print(f"Transcript writer queue was full: {self.dropped} final results were not written")
+        if self.thread:
+            try:
+                self.queue.put(None, timeout=5)
+            except queue.Full:
+                print("Warning: transcript writer is not draining its queue; closing without it")
+            self.thread.join(timeout=5)
+            if self.thread.is_alive():
+                print("Warning: transcript writer thread did not stop cleanly")
+            self.thread = None
+        for fh in self.files.values():
+            try:
+                fh.close()
+            except IOError as e:
+                print(f"Error while closing transcripts file: {e}")
+        self.files = {}
@@ -1,24 +1,59 @@
-import queue
 import sys
 import json
 import argparse
 import os
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 import sounddevice as sd
 from vosk import Model, KaldiRecognizer
+from ring_buffer import CaptureRingBuffer
+from transcript_writer import TranscriptWriter, AudioClock
+from vad import VoiceActivityGate
+from resample import StreamingResampler
+from metrics import metrics
+from recognizers import create_engine
+
+try:
+    from vosk import _ffi as _vosk_ffi
+except ImportError:
+    _vosk_ffi = None
 
 DEFAULT_MODEL = "vosk-model-small-en-us"  # folder name you downloaded
 SAMPLE_RATE = 16000                        # model-friendly SR
 TRANSCRIPTS_DIR = "transcripts"            # folder for transcript files
 DEFAULT_OUTFILE = os.path.join(TRANSCRIPTS_DIR, "transcripts.txt")  # default output file
-# Removed old DEFAULT_OUTFILE constant
 
-q = queue.Queue()
+MODEL_PATH_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "voice-tts", "model_paths.json")
+
+BLOCKSIZE = 4000                           # frames per capture block (250 ms at 16 kHz)
+RING_SLOTS = 64                            # capture blocks buffered before overflow (16 s at defaults)
+
+# Ring buffer between the audio callback and the recognizer, created by main()
+capture_buffer = None
 
-def callback(indata, frames, time, status):
+def callback(indata, frames, time_info, status):
     if status:
         print("SoundDevice status:", status, file=sys.stderr)
-    # Vosk expects 16-bit PCM bytes. When using RawInputStream with dtype='int16', indata is bytes
-    q.put(bytes(indata))
+        if status.input_overflow:
+            metrics.incr("dropped_blocks")
+    # Copy the int16 block straight into a preallocated ring slot
+    lost = capture_buffer.write(indata, time.time())
+    if lost:
+        metrics.incr("dropped_blocks", lost)
+        metrics.incr("capture_overruns")
+
+def as_waveform(view):
+    """Wrap a buffer for KaldiRecognizer.AcceptWaveform without copying it.
+
+    Vosk's cffi binding only accepts bytes for its char* argument, so other
+    buffers go through ffi.from_buffer; fall back to a copy if that is not
+    available.
+    """
+    if _vosk_ffi is None:
+        return bytes(view)
+    return _vosk_ffi.from_buffer(view)
 
 def list_devices():
     print("Available audio devices (index : name):")
@@ -26,22 +61,22 @@ def list_devices():
         print(f"{idx}: {dev['name']} (in:{dev['max_input_channels']} out:{dev['max_output_channels']})")
 
 
+def looks_like_model(p):
+    try:
+        if not os.path.isdir(p):
+            return False
+        entries = set(os.listdir(p))
+        # common indicators of a valid Vosk model
+        indicators = {'am', 'model.conf', 'final.mdl', 'HCLr.fst'}
+        return not indicators.isdisjoint(entries)
+    except Exception:
+        return False
+
 def find_model_path(path_hint):
     """Try to resolve a model folder. Accepts a folder name or path and
     searches nested folders for a viable Vosk model (checks for 'am' folder
     or 'model.conf' or 'final.mdl'). Returns an absolute path or None.
     """
-    def looks_like_model(p):
-        try:
-            if not os.path.isdir(p):
-                return False
-            entries = set(os.listdir(p))
-            # common indicators of a valid Vosk model
-            indicators = {'am', 'model.conf', 'final.mdl', 'HCLr.fst'}
-            return not indicators.isdisjoint(entries)
-        except Exception:
-            return False
-
     # If user passed an absolute or relative path that already looks valid, use it
     if looks_like_model(path_hint):
         return os.path.abspath(path_hint)
@@ -73,6 +108,67 @@ def find_model_path(path_hint):
 
     return None
 
+def load_model_path_cache():
+    try:
+        with open(MODEL_PATH_CACHE, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+def cached_model_path(path_hint):
+    """Previously resolved folder for this hint (relative to the cwd), if still valid"""
+    key = os.path.join(os.getcwd(), path_hint)
+    cached = load_model_path_cache().get(key)
+    if cached and looks_like_model(cached):
+        return cached
+    return None
+
+def remember_model_path(path_hint, resolved):
+    cache = load_model_path_cache()
+    cache[os.path.join(os.getcwd(), path_hint)] = resolved
+    temp = f"{MODEL_PATH_CACHE}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(MODEL_PATH_CACHE), exist_ok=True)
+        # Write then rename, so a concurrent run never reads a half-written cache
+        with open(temp, "w", encoding="utf-8") as fh:
+            json.dump(cache, fh, indent=2)
+        os.replace(temp, MODEL_PATH_CACHE)
+    except OSError as e:
+        print(f"Could not cache model location: {e}", file=sys.stderr)
+
+def resolve_model_path(model_path):
+    """Resolve a model hint to a folder, exiting with guidance if none is found.
+
+    A hint that is itself a model folder is used as is. Other hints are
+    resolved by searching, and the result is cached in MODEL_PATH_CACHE so
+    only the first run with a given hint has to search the working tree.
+    """
+    if looks_like_model(model_path):
+        return os.path.abspath(model_path)
+    resolved_model = cached_model_path(model_path)
+    if resolved_model:
+        return resolved_model
+    resolved_model = find_model_path(model_path)
+    if resolved_model:
+        remember_model_path(model_path, resolved_model)
+    if not resolved_model:
+        print(f"Could not locate a Vosk model using hint '{model_path}'.\n"
+              "Make sure you downloaded and extracted a model folder and pass its path via --model.\n"
+              "See https://alphacephei.com/vosk/models for available models.")
+        sys.exit(1)
+    return resolved_model
+
+def load_model(model_path):
+    """Resolve and load a Vosk model (allows nested/extracted folders)"""
+    resolved_model = resolve_model_path(model_path)
+    try:
+        return Model(resolved_model)
+    except Exception:
+        print(f"Failed to load Vosk model from '{resolved_model}'.\n"
+              "Double-check that the folder contains model files (am/, model.conf, etc.).\n"
+              "If you used a zip, ensure you extracted it and pointed to the extracted folder.")
+        raise
+
 def validate_device(device_id, samplerate):
     """Validate if the selected audio device supports the required sample rate."""
     try:
@@ -86,7 +182,31 @@ def validate_device(device_id, samplerate):
     except sd.PortAudioError as e:
         raise ValueError(f"Error validating device {device_id}: {e}")
 
-def main(model_path=DEFAULT_MODEL, device=None, samplerate=SAMPLE_RATE, callback_fn=None):
+def main(model_path=DEFAULT_MODEL, device=None, samplerate=SAMPLE_RATE, callback_fn=None,
+         ring_slots=RING_SLOTS, overflow="drop-oldest", vad=None, blocksize=BLOCKSIZE, partial_fn=None,
+         server=None, rotate_bytes=None, rotate_daily=False, model=None, native_rate=False, engine=None):
+    """Transcribe live audio; each final result is passed to ``callback_fn(text, trace=...)``.
+
+    ``blocksize`` is the capture block in frames; smaller blocks let the
+    recognizer see audio (and endpoint) sooner at a higher per-block cost.
+    ``partial_fn(text)`` is called whenever the partial result changes, and
+    with '' when an utterance ends without any final text.
+    With ``server`` ('host:port' of a recognizer_server) audio is recognized
+    by that long-lived process instead of loading the model here.
+    Final results go to transcripts.txt and, with word timings,
+    transcripts.jsonl; ``rotate_bytes``/``rotate_daily`` rotate both.
+    ``model`` is an already loaded vosk Model (``model_path`` is then unused).
+    With ``native_rate`` the device is opened at its own rate and channel
+    count and audio is downmixed and resampled to ``samplerate`` here.
+    ``engine`` (a recognizers.RecognizerEngine) recognizes with that backend
+    instead of a local Vosk model.
+
+    Captured blocks go through a ring of ``ring_slots`` preallocated blocks;
+    ``overflow`` ('drop-oldest' or 'block') decides what happens when the
+    recognizer falls that far behind. ``vad`` enables the voice activity
+    gate; it is a dict of VoiceActivityGate options (``{}`` for defaults).
+    """
+    global capture_buffer
     # Flag for controlling the main loop
     running = True
     
@@ -101,92 +221,151 @@ def main(model_path=DEFAULT_MODEL, device=None, samplerate=SAMPLE_RATE, callback
             print("No default input device. Use --list-devices to list available indices.", file=sys.stderr)
             sys.exit(1)
             
-    # Resolve model path (allow nested/extracted folders)
-    resolved_model = find_model_path(model_path)
-    if not resolved_model:
-        print(f"Could not locate a Vosk model using hint '{model_path}'.\n"
-              "Make sure you downloaded and extracted a model folder and pass its path via --model.\n"
-              "See https://alphacephei.com/vosk/models for available models.")
-        sys.exit(1)
+    if server:
+        from recognizer_server import RemoteRecognizer
+        rec = RemoteRecognizer(server, samplerate)
+        print(f"Connected to recognizer server {server} in {rec.connect_seconds * 1000:.1f} ms")
+    elif engine is not None:
+        rec = engine.create_stream(samplerate)
+        print(f"Recognizing with the {engine.name} engine")
+    else:
+        if model is None:
+            model = load_model(model_path)
+        rec = KaldiRecognizer(model, samplerate)
+        rec.SetWords(True)  # include word timing info if supported
 
-    try:
-        model = Model(resolved_model)
-    except Exception:
-        print(f"Failed to load Vosk model from '{resolved_model}'.\n"
-              "Double-check that the folder contains model files (am/, model.conf, etc.).\n"
-              "If you used a zip, ensure you extracted it and pointed to the extracted folder.")
-        raise
-    rec = KaldiRecognizer(model, samplerate)
-    rec.SetWords(True)  # include word timing info if supported
+    # Capture format: the model's rate in mono, or the device's native format
+    capture_rate, capture_channels, capture_blocksize = samplerate, 1, blocksize
+    resampler = None
+    if native_rate:
+        try:
+            device_info = sd.query_devices(device, 'input')
+        except sd.PortAudioError as e:
+            print(f"Error: Error validating device {device}: {e}", file=sys.stderr)
+            sys.exit(1)
+        capture_rate = int(device_info['default_samplerate'])
+        capture_channels = max(1, device_info['max_input_channels'])
+        capture_blocksize = int(round(blocksize * capture_rate / float(samplerate)))
+        if capture_rate != samplerate or capture_channels != 1:
+            resampler = StreamingResampler(capture_rate, samplerate, channels=capture_channels)
 
     # Validate the audio device before proceeding
     try:
-        validate_device(device, samplerate)
+        validate_device(device, capture_rate)
     except ValueError as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
 
-    print(f"Opening input device index {device} at {samplerate} Hz")
+    if resampler:
+        print(f"Opening input device index {device} at {capture_rate} Hz x{capture_channels}, "
+              f"resampling to {samplerate} Hz mono (filter delay {resampler.delay * 1000:.1f} ms)")
+    else:
+        print(f"Opening input device index {device} at {samplerate} Hz")
 
-    # Ensure transcripts directory exists
+    # Final results are written by a background thread, in batches
     transcripts_dir = os.path.join(os.getcwd(), TRANSCRIPTS_DIR)
-    os.makedirs(transcripts_dir, exist_ok=True)
-
-    # Open default transcripts file in append mode
-    out_path = os.path.join(os.getcwd(), DEFAULT_OUTFILE)
-    out_fh = None
+    writer = TranscriptWriter(transcripts_dir, rotate_bytes=rotate_bytes, rotate_daily=rotate_daily)
     try:
-        # Test if we can write to the file
-        with open(out_path, "a", encoding="utf-8") as test_fh:
-            test_fh.write("")
-        out_fh = open(out_path, "a", encoding="utf-8")
-        print(f"Appending final transcripts to: {out_path}")
+        writer.open()
+        print(f"Appending final transcripts to: {', '.join(writer.paths.values())}")
     except PermissionError:
-        print(f"Error: No permission to write to '{out_path}'", file=sys.stderr)
+        print(f"Error: No permission to write to '{transcripts_dir}'", file=sys.stderr)
         sys.exit(1)
     except OSError as e:
-        print(f"Error: Could not open transcripts file '{out_path}': {e}", file=sys.stderr)
+        print(f"Error: Could not open transcripts files in '{transcripts_dir}': {e}", file=sys.stderr)
         sys.exit(1)
+    clock = AudioClock()  # recognizer offsets -> capture time, across VAD skips and drops
+
+    def handle_final(raw, captured_at):
+        """Log a final result and pass it on to the callback"""
+        res = json.loads(raw)
+        text = res.get("text", "")
+        if not text:
+            if partial_fn and last_partial:
+                partial_fn("")  # the utterance produced nothing; drop its speculation
+            return
+        print("\nFinal:", text)
+        trace = metrics.start_trace(text)
+        trace.mark("audio_captured", captured_at)
+        trace.mark("final_result")
+        writer.write(res, trace_id=trace.trace_id, clock=clock)
+
+        # Call the callback function with the transcribed text if provided
+        if callback_fn:
+            try:
+                callback_fn(text, trace=trace)
+            except Exception as e:
+                print(f"\nError in callback function: {e}", file=sys.stderr)
+
+    # Preallocate capture storage: the ring plus one reusable block for the recognizer
+    capture_bytes = capture_blocksize * 2 * capture_channels
+    capture_buffer = CaptureRingBuffer(slots=ring_slots, block_bytes=capture_bytes, overflow=overflow)
+    block = bytearray(capture_bytes)
+    block_view = memoryview(block)
+    block_bytes = resampler.max_output(capture_blocksize) * 2 if resampler else capture_bytes
+
+    # Optional voice activity gate: skip recognition while the room is silent
+    gate = None
+    if vad is not None:
+        gate = VoiceActivityGate(sample_rate=samplerate, block_bytes=block_bytes, **vad)
+        metrics.register_gauge("vad_skipped_fraction", lambda: gate.get_stats()["skipped_fraction"])
+    # Vosk takes the capture buffer without a copy; other engines take the view as is
+    feed = as_waveform if engine is None or engine.zero_copy else memoryview
+    rec_time = 0.0   # CPU seconds spent in AcceptWaveform
+    rec_audio = 0.0  # seconds of audio handed to the recognizer
+    last_partial = ""
 
     try:
-        with sd.RawInputStream(samplerate=samplerate, blocksize=4000, dtype='int16',
-                            channels=1, callback=callback, device=device) as stream:
+        with sd.RawInputStream(samplerate=capture_rate, blocksize=capture_blocksize, dtype='int16',
+                            channels=capture_channels, callback=callback, device=device) as stream:
             if not stream.active:
                 raise sd.PortAudioError("Failed to start the audio stream")
-            
+
             print("Listening... Ctrl+C to stop.")
+            metrics.register_gauge("capture_queue_depth", capture_buffer.depth)
+            metrics.incr("dropped_blocks", 0)
+            metrics.incr("capture_overruns", 0)
             while running:
                 try:
                     # Use a timeout to check the running flag periodically
-                    try:
-                        data = q.get(timeout=0.1)
-                    except queue.Empty:
+                    nbytes, captured_at = capture_buffer.read_into(block, timeout=0.1)
+                    if not nbytes:
                         continue
 
-                    if rec.AcceptWaveform(data):
-                        res = json.loads(rec.Result())
-                        text = res.get("text", "")
-                        if text:
-                            print("\nFinal:", text)
-                            if out_fh:
-                                try:
-                                    from datetime import datetime
-                                    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                                    out_fh.write(f"[{ts}] {text}\n")
-                                    out_fh.flush()
-                                except IOError as e:
-                                    print(f"\nError writing to transcripts file: {e}", file=sys.stderr)
-                            
-                            # Call the callback function with the transcribed text if provided
-                            if callback_fn:
-                                try:
-                                    callback_fn(text)
-                                except Exception as e:
-                                    print(f"\nError in callback function: {e}", file=sys.stderr)
+                    view = block_view[:nbytes]
+                    if resampler:
+                        view = memoryview(resampler.process(view)).cast("B")
+
+                    if gate:
+                        blocks, ended = gate.process(view)
                     else:
-                        part = json.loads(rec.PartialResult())
-                        # show partial inline
-                        print("Partial:", part.get("partial", ""), end="\r")
+                        blocks, ended = (view,), False
+
+                    # captured_at is when the last block ended; earlier ones (VAD pre-roll) precede it
+                    chunk_start = captured_at - sum(len(chunk) for chunk in blocks) / 2.0 / samplerate
+                    for chunk in blocks:
+                        seconds = len(chunk) / 2.0 / samplerate
+                        clock.fed(seconds, chunk_start)
+                        chunk_start += seconds
+                        started = time.perf_counter()
+                        accepted = rec.AcceptWaveform(feed(chunk))
+                        rec_time += time.perf_counter() - started
+                        rec_audio += seconds
+                        if accepted:
+                            handle_final(rec.Result(), captured_at)
+                            last_partial = ""
+                        else:
+                            partial = json.loads(rec.PartialResult()).get("partial", "")
+                            # show partial inline
+                            print("Partial:", partial, end="\r")
+                            if partial_fn and partial and partial != last_partial:
+                                partial_fn(partial)
+                            last_partial = partial
+
+                    if ended:
+                        # Speech stopped: finalize now instead of waiting for Vosk's endpointer
+                        handle_final(rec.FinalResult(), captured_at)
+                        last_partial = ""
                 except Exception as e:
                     print(f"\nError processing audio: {e}", file=sys.stderr)
                     if not running:  # Don't continue if we're shutting down
@@ -199,25 +378,211 @@ def main(model_path=DEFAULT_MODEL, device=None, samplerate=SAMPLE_RATE, callback
         stop_recording()  # Ensure we stop on errors too
         raise
     finally:
-        if out_fh:
+        if resampler and resampler.blocks:
+            print(f"Resampling used {resampler.busy_time / max(rec_audio, 1e-9):.4f}s CPU per second of audio "
+                  f"({resampler.busy_time / resampler.blocks * 1e6:.0f} us per block)")
+        if gate:
+            cost = rec_time / rec_audio if rec_audio else None
+            stats = gate.get_stats(cost)
+            print(f"VAD skipped {stats['skipped_seconds']:.1f}s of {stats['audio_seconds']:.1f}s "
+                  f"({stats['skipped_fraction']:.0%}), ~{stats.get('cpu_saved_seconds', 0.0):.2f}s CPU saved "
+                  f"over {stats['utterances']} utterances")
+        stats = capture_buffer.get_stats()
+        if stats["overruns"]:
+            print(f"Capture buffer overran {stats['overruns']} times, "
+                  f"{stats['dropped']} blocks dropped ({overflow})", file=sys.stderr)
+        writer.close()
+        if server:
+            rec.close()
+        if engine is not None and engine.get_stats().get("batches"):
+            stats = engine.get_stats()
+            print(f"{engine.name}: {stats['utterances']} utterances in {stats['batches']} batches "
+                  f"(avg {stats['avg_batch']:.1f}), RTF {stats['rtf']:.3f} on {stats['threads']} threads")
+
+# Model loaded once per batch worker process
+_worker_model = None
+
+def _init_batch_worker(model_dir):
+    global _worker_model
+    _worker_model = Model(model_dir)
+
+def find_wav_files(paths):
+    """Expand files and directories into a sorted list of .wav files"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                found.extend(os.path.join(root, f) for f in files if f.lower().endswith(".wav"))
+        elif os.path.isfile(path):
+            found.append(path)
+        else:
+            print(f"Warning: '{path}' does not exist, skipping", file=sys.stderr)
+    return sorted(found)
+
+def _downmix(data, channels):
+    """Average interleaved int16 channels into mono"""
+    import numpy as np
+    samples = np.frombuffer(data, dtype=np.int16).reshape(-1, channels)
+    return samples.mean(axis=1).astype(np.int16).tobytes()
+
+def transcribe_file(path, block_frames=4000, engine=None):
+    """Transcribe one WAV file in a batch worker (or with a shared ``engine``).
+
+    Returns the transcript lines (in the live ``[timestamp] text`` format,
+    timestamped from the file's recording time plus the utterance offset),
+    the audio duration and the processing time.
+    """
+    started = time.perf_counter()
+    lines = []
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 2 or wf.getcomptype() != "NONE":
+            raise ValueError("only 16-bit PCM WAV files are supported")
+        channels = wf.getnchannels()
+        rate = wf.getframerate()
+        duration = wf.getnframes() / float(rate)
+
+        # The file was last written when the recording ended
+        recording_start = datetime.fromtimestamp(os.path.getmtime(path)) - timedelta(seconds=duration)
+
+        if engine is not None:
+            rec = engine.create_stream(rate)
+        else:
+            rec = KaldiRecognizer(_worker_model, rate)
+            rec.SetWords(True)
+
+        def add_result(raw):
+            res = json.loads(raw)
+            text = res.get("text", "")
+            if text:
+                words = res.get("result") or [{}]
+                offset = words[0].get("start", res.get("start", 0.0))
+                ts = (recording_start + timedelta(seconds=offset)).strftime("%Y-%m-%d %H:%M:%S")
+                lines.append(f"[{ts}] {text}")
+
+        while True:
+            data = wf.readframes(block_frames)
+            if not data:
+                break
+            if channels > 1:
+                data = _downmix(data, channels)
+            if rec.AcceptWaveform(data):
+                add_result(rec.Result())
+        # Batched engines may still have several utterances in flight; keep them apart
+        for raw in rec.flush() if hasattr(rec, "flush") else [rec.FinalResult()]:
+            add_result(raw)
+
+    return {"path": path, "lines": lines, "duration": duration,
+            "elapsed": time.perf_counter() - started}
+
+def transcribe_batch(paths, model_path=DEFAULT_MODEL, workers=None, output_dir=TRANSCRIPTS_DIR, engine=None):
+    """Transcribe WAV files across a process pool, one transcript file per input.
+
+    Transcripts mirror the inputs' folder layout (relative to the folder the
+    inputs have in common) under ``output_dir``, so same-named recordings in
+    different folders do not overwrite each other; an existing transcript is
+    replaced. Each worker process loads the model once. Reports per-file and overall
+    real-time factor (processing time / audio time) and throughput. With a
+    batching ``engine`` the files are read by ``workers`` threads instead,
+    all feeding that one engine, so utterances from different files share
+    batches. Returns the results and the paths that failed.
+    """
+    files = find_wav_files(paths)
+    if not files:
+        print("No WAV files found to transcribe.", file=sys.stderr)
+        return [], []
+    common = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in files])
+
+    if engine is not None:
+        workers = max(1, min(workers or getattr(engine, "batch_size", 1), len(files)))
+        pool = ThreadPoolExecutor(max_workers=workers)
+        print(f"Transcribing {len(files)} files with the {engine.name} engine from {workers} threads...")
+    else:
+        resolved_model = resolve_model_path(model_path)
+        workers = max(1, min(workers or os.cpu_count() or 1, len(files)))
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker, initargs=(resolved_model,))
+        print(f"Transcribing {len(files)} files with {workers} worker processes...")
+    os.makedirs(output_dir, exist_ok=True)
+
+    results = []
+    failed = []
+    wall_start = time.perf_counter()
+    with pool:
+        futures = {pool.submit(transcribe_file, path, engine=engine): path for path in files}
+        for future in as_completed(futures):
+            path = futures[future]
             try:
-                out_fh.flush()
-                out_fh.close()
-            except IOError as e:
-                print(f"Error while closing transcripts file: {e}", file=sys.stderr)
+                result = future.result()
+            except Exception as e:
+                print(f"Error transcribing '{path}': {e}", file=sys.stderr)
+                failed.append(path)
+                continue
+
+            relative = os.path.relpath(os.path.abspath(path), common)
+            out_path = os.path.join(output_dir, os.path.splitext(relative)[0] + ".txt")
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            with open(out_path, "w", encoding="utf-8") as out_fh:
+                out_fh.writelines(line + "\n" for line in result["lines"])
+            rtf = result["elapsed"] / result["duration"] if result["duration"] else 0.0
+            print(f"{path}: {result['duration']:.1f}s audio in {result['elapsed']:.1f}s "
+                  f"(RTF {rtf:.3f}) -> {out_path}")
+            results.append(result)
+    wall = time.perf_counter() - wall_start
+
+    total_audio = sum(r["duration"] for r in results)
+    total_cpu = sum(r["elapsed"] for r in results)
+    if total_audio:
+        print(f"\nTranscribed {total_audio:.1f}s of audio from {len(results)} files in {wall:.1f}s")
+        print(f"Per-worker RTF: {total_cpu / total_audio:.3f}, "
+              f"throughput: {total_audio / wall:.1f}x real time")
+    if failed:
+        print(f"{len(failed)} of {len(files)} files failed", file=sys.stderr)
+    return results, failed
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Vosk mic -> realtime transcription")
-    parser.add_argument("--model", default=DEFAULT_MODEL, help="Path to Vosk model folder")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Path to Vosk model folder (or transformers model folder)")
+    parser.add_argument("--engine", choices=["vosk", "transformers"], default="vosk", help="Recognizer backend")
+    parser.add_argument("--batch-size", type=int, default=8, help="Utterances per forward pass (transformers)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Torch threads for the transformers engine (default: physical cores)")
     parser.add_argument("--device", type=int, default=None, help="Input device index (sounddevice). If omitted, uses default input.")
     parser.add_argument("--samplerate", type=int, default=SAMPLE_RATE, help="Sample rate to use (Hz)")
+    parser.add_argument("--native-rate", action="store_true",
+                        help="Capture at the device's own rate/channels and resample in-process")
     parser.add_argument("--list-devices", action="store_true", help="List sound devices and exit")
+    parser.add_argument("--blocksize", type=int, default=BLOCKSIZE,
+                        help="Frames per capture block (smaller = lower latency, more CPU)")
+    parser.add_argument("--buffer-blocks", type=int, default=RING_SLOTS, help="Capture blocks buffered before overflow")
+    parser.add_argument("--overflow", choices=["drop-oldest", "block"], default="drop-oldest",
+                        help="What to do when the capture buffer is full")
+    parser.add_argument("--vad", action="store_true", help="Skip recognition during silence (voice activity gate)")
+    parser.add_argument("--vad-threshold", type=float, default=-45.0, help="Speech level threshold in dBFS")
+    parser.add_argument("--vad-hangover", type=int, default=400, help="Silence (ms) before an utterance is finalized")
+    parser.add_argument("--vad-preroll", type=int, default=300, help="Audio (ms) kept from before speech onset")
+    parser.add_argument("--rotate-mb", type=float, default=None, help="Rotate transcript files at this size")
+    parser.add_argument("--rotate-daily", action="store_true", help="Start new transcript files every day")
+    parser.add_argument("--server", default=None, metavar="HOST:PORT",
+                        help="Use a running recognizer_server.py instead of loading the model")
+    parser.add_argument("--batch", nargs="+", metavar="PATH", help="Transcribe WAV files/directories instead of the microphone")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for --batch (default: CPU count)")
+    parser.add_argument("--batch-output", default=TRANSCRIPTS_DIR, help="Folder for --batch transcripts")
     args = parser.parse_args()
 
     if args.list_devices:
         list_devices()
         sys.exit(0)
 
+    engine = None
+    if args.engine != "vosk":
+        engine = create_engine(args.engine, model_path=args.model, batch_size=args.batch_size, threads=args.threads)
+
+    if args.batch:
+        _, failed = transcribe_batch(args.batch, model_path=args.model, workers=args.workers,
+                                     output_dir=args.batch_output, engine=engine)
+        if engine:
+            engine.close()
+        sys.exit(1 if failed else 0)
+
     # If user didn't pass device, use default device
     device_to_use = args.device
     if device_to_use is None:
@@ -227,7 +592,14 @@ if __name__ == "__main__":
             sys.exit(1)
     
     try:
-        main(model_path=args.model, device=device_to_use, samplerate=args.samplerate)
+        vad = None
+        if args.vad:
+            vad = {"threshold_db": args.vad_threshold, "hangover_ms": args.vad_hangover,
+                   "preroll_ms": args.vad_preroll}
+        main(model_path=args.model, device=device_to_use, samplerate=args.samplerate,
+             ring_slots=args.buffer_blocks, overflow=args.overflow, vad=vad, blocksize=args.blocksize,
+             server=args.server, rotate_daily=args.rotate_daily, native_rate=args.native_rate, engine=engine,
+             rotate_bytes=int(args.rotate_mb * 1024 * 1024) if args.rotate_mb else None)
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
\ No newline at end of file
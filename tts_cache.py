@@ -0,0 +1,140 @@
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = os.path.join("audio_clips", "cache")
+
+def normalize_text(text):
+    """Normalize text so trivially different phrasings share a cache entry"""
+    text = text.strip().lower()
+    text = re.sub(r"[^\w\s']", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+class TTSCache:
+    """Content-addressed on-disk cache of synthesized clips with LRU eviction.
+
+    Entries are keyed by the normalized text, the language and the engine
+    settings, and are stored as ``<sha256>.<ext>`` files inside ``cache_dir``.
+    The cache is bounded by both an entry count and a byte budget.
+
+    Clips go in and out as bytes, never as paths: ``store`` writes a temp
+    file and renames it into place, and ``get`` reads the file under the
+    lock, so eviction can never remove a clip a caller is about to open.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=50 * 1024 * 1024, max_entries=1000):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (path, size), oldest first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        """Index clips left over from a previous run, oldest first"""
+        found = []
+        for filename in os.listdir(self.cache_dir):
+            filepath = os.path.join(self.cache_dir, filename)
+            if filename.endswith(".tmp"):
+                # Half-written clip from a run that died mid-write
+                try:
+                    os.remove(filepath)
+                except OSError:
+                    pass
+                continue
+            key, _ = os.path.splitext(filename)
+            if not os.path.isfile(filepath) or len(key) != 64:
+                continue
+            try:
+                found.append((os.path.getmtime(filepath), key, filepath, os.path.getsize(filepath)))
+            except OSError:
+                continue
+
+        for _, key, filepath, size in sorted(found):
+            self.entries[key] = (filepath, size)
+            self.total_bytes += size
+        self._evict()
+
+        if self.entries:
+            print(f"Loaded {len(self.entries)} cached clips ({self.total_bytes} bytes) from {self.cache_dir}")
+
+    def make_key(self, text, lang='en', settings=None):
+        """Build the cache key for a phrase, language and engine settings"""
+        parts = [normalize_text(text), lang]
+        for name, value in sorted((settings or {}).items()):
+            parts.append(f"{name}={value}")
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def path_for(self, key, extension="mp3"):
+        """Return the file path a clip with this key is stored at"""
+        return os.path.join(self.cache_dir, f"{key}.{extension}")
+
+    def get(self, key):
+        """Return ``(audio bytes, extension)`` of the cached clip for a key, or None on a miss"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                try:
+                    with open(entry[0], "rb") as fh:
+                        data = fh.read()
+                except OSError:
+                    # File vanished from disk, forget about it
+                    del self.entries[key]
+                    self.total_bytes -= entry[1]
+                else:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return data, os.path.splitext(entry[0])[1].lstrip(".")
+            self.misses += 1
+            return None
+
+    def store(self, key, data, extension="mp3"):
+        """Write a clip atomically and register it; returns its path"""
+        filepath = self.path_for(key, extension=extension)
+        temp = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp, "wb") as fh:
+            fh.write(data)
+        os.replace(temp, filepath)
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old:
+                self.total_bytes -= old[1]
+            self.entries[key] = (filepath, len(data))
+            self.total_bytes += len(data)
+            self._evict(keep=key)
+        return filepath
+
+    def _evict(self, keep=None):
+        """Drop least recently used clips (other than ``keep``) until within budget"""
+        while self.total_bytes > self.max_bytes or len(self.entries) > self.max_entries:
+            key = next((k for k in self.entries if k != keep), None)
+            if key is None:
+                break  # only the clip just stored is left
+            filepath, size = self.entries.pop(key)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(filepath)
+            except OSError as e:
+                print(f"Error evicting cached clip {filepath}: {e}")
+
+    def get_stats(self):
+        """Return hit/miss counters and current usage"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,280 @@
+import io
+import re
+import json
+import math
+import time
+import wave
+import array
+import base64
+import shutil
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT = 10  # seconds for connect/read on TTS HTTP requests
+
+def make_pooled_session(pool_size=4, retries=2):
+    """Create a requests session that keeps connections alive between calls.
+
+    Failed connections are retried for every method (nothing was sent yet);
+    read errors and 5xx responses only for idempotent methods, so a POST
+    that may have reached the server is never sent twice.
+    """
+    session = requests.Session()
+    retry = Retry(total=retries, connect=retries, read=retries, status=retries, backoff_factor=0.2,
+                  status_forcelist=(500, 502, 503, 504), allowed_methods=Retry.DEFAULT_ALLOWED_METHODS)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def make_tone_wav(duration, sample_rate=16000, frequency=440.0, amplitude=0.3):
+    """Generate a mono 16-bit sine tone as WAV bytes"""
+    n_samples = max(1, int(duration * sample_rate))
+    peak = int(32767 * amplitude)
+    step = 2 * math.pi * frequency / sample_rate
+    samples = array.array('h', (int(peak * math.sin(step * i)) for i in range(n_samples)))
+
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(samples.tobytes())
+    return buf.getvalue()
+
+class TTSEngine:
+    """Base class for text-to-speech backends.
+
+    Backends return the encoded clip as bytes; ``extension`` names the
+    container format so callers know how to store or decode it.
+    """
+    name = "base"
+    extension = "mp3"
+
+    def settings(self):
+        """Settings that affect the synthesized audio (used as a cache key)"""
+        return {"engine": self.name}
+
+    def synthesize(self, text, lang='en'):
+        """Synthesize text and return the encoded audio bytes"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources held by the engine"""
+        pass
+
+class GTTSEngine(TTSEngine):
+    """Google Translate TTS using one pooled keep-alive HTTP session"""
+    name = "gtts"
+    extension = "mp3"
+
+    def __init__(self, tld='com', slow=False, timeout=DEFAULT_TIMEOUT, pool_size=4):
+        self.tld = tld
+        self.slow = slow
+        self.timeout = timeout
+        self.session = make_pooled_session(pool_size=pool_size)
+
+    def settings(self):
+        return {"engine": self.name, "tld": self.tld, "slow": self.slow}
+
+    def stream(self, text, lang='en'):
+        """Yield mp3 bytes for each part gTTS splits the text into"""
+        import gtts
+
+        tts = gtts.gTTS(text, lang=lang, tld=self.tld, slow=self.slow, timeout=self.timeout)
+        yielded = False
+        try:
+            for part in self._pooled_parts(tts):
+                yielded = True
+                yield part
+            return
+        except (AttributeError, TypeError, ValueError) as e:
+            if yielded:
+                raise gtts.gTTSError(tts=tts) from e
+            print(f"gTTS internals changed ({e}); using gTTS.stream() without connection pooling")
+        yield from tts.stream()
+
+    def _pooled_parts(self, tts):
+        """Send gTTS's requests over the pooled session.
+
+        gTTS opens a new session per request, so this uses its private
+        ``_prepare_requests()`` and repeats its response parsing, as of
+        gTTS 2.5.4 (pinned in requirements.txt). If either has changed it
+        raises AttributeError/TypeError/ValueError before yielding anything
+        and ``stream`` falls back to the public ``gTTS.stream()``.
+        """
+        import gtts
+
+        for prepared in tts._prepare_requests():
+            # send() skips the environment lookup request() does; apply proxies and CA settings here
+            settings = self.session.merge_environment_settings(prepared.url, {}, None, None, None)
+            try:
+                response = self.session.send(prepared, timeout=self.timeout, **settings)
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                raise gtts.gTTSError(tts=tts) from e
+
+            found = False
+            for line in response.iter_lines(chunk_size=1024):
+                decoded_line = line.decode("utf-8")
+                if "jQ1olc" not in decoded_line:
+                    continue
+                audio_search = re.search(r'jQ1olc","\[\\"(.*)\\"]', decoded_line)
+                if not audio_search:
+                    raise ValueError("unexpected gTTS response format")
+                found = True
+                yield base64.b64decode(audio_search.group(1).encode("ascii"))
+            if not found:
+                raise ValueError("no audio in gTTS response")
+
+    def synthesize(self, text, lang='en'):
+        return b"".join(self.stream(text, lang=lang))
+
+    def close(self):
+        self.session.close()
+
+class OfflineEngine(TTSEngine):
+    """Local espeak/espeak-ng synthesis, no network required"""
+    name = "offline"
+    extension = "wav"
+
+    def __init__(self, voice=None, rate=175, timeout=DEFAULT_TIMEOUT):
+        self.binary = shutil.which("espeak-ng") or shutil.which("espeak")
+        if not self.binary:
+            raise RuntimeError("Offline TTS requires espeak-ng or espeak on PATH")
+        self.voice = voice
+        self.rate = rate
+        self.timeout = timeout
+
+    def settings(self):
+        return {"engine": self.name, "voice": self.voice, "rate": self.rate}
+
+    def synthesize(self, text, lang='en'):
+        cmd = [self.binary, "--stdout", "-s", str(self.rate), "-v", self.voice or lang, text]
+        result = subprocess.run(cmd, capture_output=True, timeout=self.timeout)
+        if result.returncode != 0 or not result.stdout:
+            raise RuntimeError(f"espeak failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+        return result.stdout
+
+class HTTPTTSEngine(TTSEngine):
+    """Client for a simple JSON-over-HTTP TTS service (see StubTTSServer)"""
+    name = "http"
+    extension = "wav"
+
+    def __init__(self, url, timeout=DEFAULT_TIMEOUT, pool_size=4):
+        self.url = url
+        self.timeout = timeout
+        self.session = make_pooled_session(pool_size=pool_size)
+
+    def settings(self):
+        return {"engine": self.name, "url": self.url}
+
+    def synthesize(self, text, lang='en'):
+        response = self.session.post(self.url, json={"text": text, "lang": lang}, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
+
+    def close(self):
+        self.session.close()
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled clients reuse the socket
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.send_error(400, "Invalid JSON")
+            return
+
+        text = payload.get("text", "")
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body = make_tone_wav(min(len(text) * self.server.seconds_per_char, 10.0),
+                             sample_rate=self.server.sample_rate)
+        self.server.requests_served += 1
+
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/wav")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubTTSServer:
+    """Local HTTP server that answers TTS requests with a sine tone.
+
+    The clip length scales with the text length and an optional fixed
+    ``latency`` simulates a remote service, which makes it suitable for
+    tests and benchmarks that must not touch the network.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, seconds_per_char=0.06, sample_rate=16000):
+        self.httpd = ThreadingHTTPServer((host, port), _StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.seconds_per_char = seconds_per_char
+        self.httpd.sample_rate = sample_rate
+        self.httpd.requests_served = 0
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/synthesize"
+
+    @property
+    def requests_served(self):
+        return self.httpd.requests_served
+
+    def start(self):
+        """Start serving in a background thread"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server and close its socket"""
+        if self.thread:
+            self.httpd.shutdown()
+            self.thread.join(timeout=2)
+            self.thread = None
+        self.httpd.server_close()
+
+class StubEngine(HTTPTTSEngine):
+    """HTTPTTSEngine bundled with its own StubTTSServer"""
+    name = "stub"
+
+    def __init__(self, latency=0.0, timeout=DEFAULT_TIMEOUT, pool_size=4):
+        self.server = StubTTSServer(latency=latency).start()
+        super().__init__(self.server.url, timeout=timeout, pool_size=pool_size)
+
+    def settings(self):
+        return {"engine": self.name}
+
+    def close(self):
+        super().close()
+        self.server.stop()
+
+ENGINES = {
+    "gtts": GTTSEngine,
+    "offline": OfflineEngine,
+    "stub": StubEngine,
+}
+
+def create_engine(name="gtts", **kwargs):
+    """Create a TTS engine by name ('gtts', 'offline' or 'stub')"""
+    try:
+        engine_cls = ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown TTS engine '{name}' (choose from {', '.join(ENGINES)})")
+    return engine_cls(**kwargs)
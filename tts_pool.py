@@ -0,0 +1,183 @@
+import queue
+import threading
+import time
+
+class TTSWorkerPool:
+    """Bounded pool of TTS workers that delivers clips in submission order.
+
+    Utterances are numbered as they are submitted. Workers synthesize them
+    concurrently and hand each finished clip to ``emit``; a reorder buffer
+    releases clips to ``deliver_fn`` strictly in utterance order, so an
+    utterance that finishes early waits for the ones submitted before it.
+
+    At most ``max_pending`` utterances may be in flight (queued, being
+    synthesized or waiting for reordering). When the pool is full, ``submit``
+    blocks (``overflow='block'``) or drops the new utterance
+    (``overflow='drop'``); both cases are counted.
+    """
+
+    def __init__(self, synth_fn, deliver_fn, num_workers=2, max_pending=8, overflow="block"):
+        if overflow not in ("block", "drop"):
+            raise ValueError("overflow must be 'block' or 'drop'")
+        self.synth_fn = synth_fn          # synth_fn(text, emit, **kwargs) calls emit(clip, **meta) per clip
+        self.deliver_fn = deliver_fn      # deliver_fn(clip, **meta) receives clips in utterance order
+        self.num_workers = num_workers
+        self.max_pending = max_pending
+        self.overflow = overflow
+
+        self.jobs = queue.Queue()
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.lock = threading.Lock()
+        self.results = {}                 # seq -> [(clip, meta) not yet delivered, finished flag]
+        self.next_submit = 0
+        self.next_deliver = 0
+        self.retired = 0                  # utterances whose clips have all been delivered
+        self.delivering = False           # one thread at a time hands clips to deliver_fn
+        self.workers = []
+        self.running = False
+
+        # Statistics
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.backpressure_waits = 0
+        self.backpressure_time = 0.0
+        self.max_depth = 0
+        self.reordered = 0
+
+    def start(self):
+        """Start the worker threads"""
+        if self.running:
+            return
+        self.running = True
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self.worker, name=f"tts-worker-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def stop(self, timeout=2):
+        """Stop the workers; utterances still queued are abandoned"""
+        self.running = False
+        for _ in self.workers:
+            self.jobs.put(None)
+        for worker in self.workers:
+            worker.join(timeout=timeout)
+            if worker.is_alive():
+                print(f"Warning: {worker.name} did not stop cleanly")
+        self.workers = []
+
+    def submit(self, text, **kwargs):
+        """Queue an utterance for synthesis; returns its sequence number or None if dropped"""
+        if not self.slots.acquire(blocking=False):
+            if self.overflow == "drop":
+                with self.lock:
+                    self.dropped += 1
+                print(f"TTS pool full ({self.max_pending} pending), dropping utterance: {text}")
+                return None
+
+            print(f"TTS pool full ({self.max_pending} pending), waiting for a free slot...")
+            started = time.perf_counter()
+            self.slots.acquire()
+            with self.lock:
+                self.backpressure_waits += 1
+                self.backpressure_time += time.perf_counter() - started
+
+        with self.lock:
+            seq = self.next_submit
+            self.next_submit += 1
+            self.results[seq] = [[], False]
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, self.next_submit - self.retired)
+        self.jobs.put((seq, text, kwargs))
+        return seq
+
+    def worker(self):
+        """Synthesize queued utterances until stopped"""
+        while self.running:
+            job = self.jobs.get()
+            if job is None:
+                break
+            seq, text, kwargs = job
+            try:
+                self.synth_fn(text, lambda clip, **meta: self._emit(seq, clip, meta), **kwargs)
+                with self.lock:
+                    self.completed += 1
+            except Exception as e:
+                print(f"Error synthesizing '{text}': {e}")
+                with self.lock:
+                    self.failed += 1
+            finally:
+                self._finish(seq)
+
+    def _emit(self, seq, clip, meta):
+        with self.lock:
+            self.results[seq][0].append((clip, meta))
+            if seq != self.next_deliver:
+                self.reordered += 1
+        self._flush()
+
+    def _finish(self, seq):
+        with self.lock:
+            self.results[seq][1] = True
+        self._flush()
+
+    def _take_ready(self):
+        """Pop the clips of the oldest utterances that may go out now; caller holds the lock.
+
+        Returns the clips and how many utterances they complete.
+        """
+        ready, done = [], 0
+        while self.next_deliver in self.results:
+            clips, finished = self.results[self.next_deliver]
+            ready.extend(clips)
+            del clips[:]
+            if not finished:
+                break
+            del self.results[self.next_deliver]
+            self.next_deliver += 1
+            done += 1
+        return ready, done
+
+    def _flush(self):
+        """Deliver ready clips in order, without holding the lock while the player runs"""
+        with self.lock:
+            if self.delivering:
+                return  # the delivering thread picks up our clips on its next pass
+            self.delivering = True
+        done = 0
+        while True:
+            with self.lock:
+                # Utterances delivered on the last pass leave the pool only now
+                self.retired += done
+                for _ in range(done):
+                    self.slots.release()
+                ready, done = self._take_ready()
+                if not ready and not done:
+                    self.delivering = False
+                    return
+            for clip, meta in ready:
+                try:
+                    self.deliver_fn(clip, **meta)
+                except Exception as e:
+                    print(f"Error delivering clip: {e}")
+
+    def get_depth(self):
+        """Number of utterances submitted but not yet fully delivered"""
+        with self.lock:
+            return self.next_submit - self.retired
+
+    def get_stats(self):
+        """Return queue depth and backpressure counters"""
+        with self.lock:
+            return {
+                "depth": self.next_submit - self.retired,
+                "max_depth": self.max_depth,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "reordered_clips": self.reordered,
+                "backpressure_waits": self.backpressure_waits,
+                "backpressure_time": self.backpressure_time,
+            }
@@ -0,0 +1,138 @@
+import math
+import time
+
+import numpy as np
+
+class VoiceActivityGate:
+    """Energy-based voice activity gate for int16 capture blocks.
+
+    Each block is split into ``frame_ms`` frames and their RMS level (dBFS)
+    is computed in one vectorized NumPy pass. A block counts as speech when
+    any frame is above the threshold: the larger of ``threshold_db`` and the
+    tracked noise floor plus ``noise_margin_db``. The noise floor follows
+    the mean level of silent blocks, and during speech it follows the
+    quietest frame of each block ten times more slowly, so a background that
+    gets louder mid-utterance (a fan switching on) cannot hold the gate open
+    for good.
+
+    While silent, blocks are kept in a small pre-roll ring instead of being
+    recognized; when speech starts the pre-roll is released first so word
+    onsets are not clipped. After ``hangover_ms`` of silence following
+    speech the gate closes and reports that the utterance ended, so the
+    caller can finalize it right away.
+    """
+
+    def __init__(self, sample_rate=16000, block_bytes=8000, threshold_db=-45.0, noise_margin_db=10.0,
+                 frame_ms=30, hangover_ms=400, preroll_ms=300):
+        self.sample_rate = sample_rate
+        self.threshold_db = threshold_db
+        self.noise_margin_db = noise_margin_db
+        self.frame_len = max(1, int(sample_rate * frame_ms / 1000))
+        self.hangover = hangover_ms / 1000.0
+        self.noise_floor_db = threshold_db - noise_margin_db
+
+        # Pre-roll ring of preallocated blocks
+        block_seconds = block_bytes / 2.0 / sample_rate
+        self.preroll_slots = max(1, int(math.ceil(preroll_ms / 1000.0 / block_seconds))) if preroll_ms else 0
+        self.preroll = [bytearray(block_bytes) for _ in range(self.preroll_slots)]
+        self.preroll_views = [memoryview(buf) for buf in self.preroll]
+        self.preroll_lengths = [0] * self.preroll_slots
+        self.preroll_count = 0
+        self.preroll_next = 0
+
+        self.in_speech = False
+        self.silence_run = 0.0
+
+        # Statistics (seconds of audio)
+        self.total_seconds = 0.0
+        self.skipped_seconds = 0.0
+        self.utterances = 0
+        self.gate_time = 0.0  # CPU time spent in the gate itself
+
+    def level_db(self, view):
+        """Per-frame RMS level of an int16 block in dBFS"""
+        samples = np.frombuffer(view, dtype=np.int16)
+        n_frames = max(1, len(samples) // self.frame_len)
+        frames = samples[:n_frames * self.frame_len].reshape(n_frames, -1).astype(np.float32)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        return 20.0 * np.log10(rms / 32768.0 + 1e-10)
+
+    def is_speech(self, view):
+        """Classify a block and update the tracked noise floor"""
+        levels = self.level_db(view)
+        threshold = max(self.threshold_db, self.noise_floor_db + self.noise_margin_db)
+        speech = bool((levels > threshold).any())
+        if not speech:
+            # Slowly follow the background level so a noisy room raises the bar
+            self.noise_floor_db += 0.05 * (float(levels.mean()) - self.noise_floor_db)
+        else:
+            # Pauses between words still show the background; follow them much more slowly
+            self.noise_floor_db += 0.005 * (float(levels.min()) - self.noise_floor_db)
+        return speech
+
+    def _stash(self, view):
+        slot = self.preroll_next
+        self.preroll[slot][:len(view)] = view
+        self.preroll_lengths[slot] = len(view)
+        self.preroll_next = (slot + 1) % self.preroll_slots
+        self.preroll_count = min(self.preroll_count + 1, self.preroll_slots)
+
+    def _drain_preroll(self):
+        start = (self.preroll_next - self.preroll_count) % self.preroll_slots
+        blocks = []
+        for i in range(self.preroll_count):
+            slot = (start + i) % self.preroll_slots
+            blocks.append(self.preroll_views[slot][:self.preroll_lengths[slot]])
+        self.preroll_count = 0
+        return blocks
+
+    def process(self, view):
+        """Gate one block.
+
+        Returns ``(blocks, ended)``: the blocks to hand to the recognizer now
+        (possibly empty, or pre-roll plus this block) and whether an
+        utterance just ended and should be finalized.
+        """
+        started = time.perf_counter()
+        seconds = len(view) / 2.0 / self.sample_rate
+        self.total_seconds += seconds
+        speech = self.is_speech(view)
+
+        blocks, ended = [], False
+        if self.in_speech:
+            blocks.append(view)
+            if speech:
+                self.silence_run = 0.0
+            else:
+                self.silence_run += seconds
+                if self.silence_run >= self.hangover:
+                    self.in_speech = False
+                    ended = True
+        elif speech:
+            self.in_speech = True
+            self.silence_run = 0.0
+            self.utterances += 1
+            blocks = self._drain_preroll()
+            self.skipped_seconds -= len(blocks) * seconds  # pre-roll is recognized after all
+            blocks.append(view)
+        else:
+            self.skipped_seconds += seconds
+            if self.preroll_slots:
+                self._stash(view)
+
+        self.gate_time += time.perf_counter() - started
+        return blocks, ended
+
+    def get_stats(self, recognizer_seconds_per_audio_second=None):
+        """Fraction of audio skipped and, given the recognizer's measured cost, CPU saved"""
+        skipped_fraction = self.skipped_seconds / self.total_seconds if self.total_seconds else 0.0
+        stats = {
+            "audio_seconds": self.total_seconds,
+            "skipped_seconds": self.skipped_seconds,
+            "skipped_fraction": skipped_fraction,
+            "utterances": self.utterances,
+            "gate_cpu_seconds": self.gate_time,
+        }
+        if recognizer_seconds_per_audio_second is not None:
+            stats["cpu_saved_seconds"] = self.skipped_seconds * recognizer_seconds_per_audio_second - self.gate_time
+        return stats